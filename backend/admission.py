@@ -0,0 +1,123 @@
+import os
+import math
+import time
+import threading
+from metrics import Counter, Gauge, Histogram
+
+# Concurrent CPU-heavy analysis requests (/upload-video, upload finalize); beyond this
+# up to ANALYSIS_MAX_QUEUE wait for a slot and the rest are rejected with 429
+ANALYSIS_MAX_CONCURRENT = int(os.getenv('ANALYSIS_MAX_CONCURRENT', os.getenv('POSE_POOL_SIZE', os.cpu_count() or 1)))
+ANALYSIS_MAX_QUEUE = int(os.getenv('ANALYSIS_MAX_QUEUE', str(2 * ANALYSIS_MAX_CONCURRENT)))
+# Seconds a queued analysis request waits for a slot before it is rejected
+ANALYSIS_QUEUE_TIMEOUT = float(os.getenv('ANALYSIS_QUEUE_TIMEOUT', '30'))
+# Same bounds for the lightweight DB/API routes
+API_MAX_CONCURRENT = int(os.getenv('API_MAX_CONCURRENT', '32'))
+API_MAX_QUEUE = int(os.getenv('API_MAX_QUEUE', '64'))
+API_QUEUE_TIMEOUT = float(os.getenv('API_QUEUE_TIMEOUT', '5'))
+# Streaming analysis of a chunked upload holds a pose worker for as long as the client
+# takes to upload, so at most this many run at once (never queued); other uploads are
+# analysed at finalize, through the analysis tier
+STREAMING_MAX_CONCURRENT = int(os.getenv('STREAMING_MAX_CONCURRENT', str(max(1, ANALYSIS_MAX_CONCURRENT // 2))))
+# Live WebSocket sessions each run a pose graph and inference thread in the server
+# process; connections beyond this many are told the server is busy and closed
+LIVE_MAX_SESSIONS = int(os.getenv('LIVE_MAX_SESSIONS', '2'))
+
+ADMISSION_REJECTED = Counter('sap_admission_rejected_total', "Requests rejected because their tier was full",
+                             ('tier',))
+ADMISSION_WAIT_SECONDS = Histogram('sap_admission_wait_seconds', "Time admitted requests queued for a slot",
+                                   ('tier',))
+ADMISSION_ACTIVE = Gauge('sap_admission_active', "Requests holding a slot, per tier", ('tier',))
+ADMISSION_WAITING = Gauge('sap_admission_waiting', "Requests queued for a slot, per tier", ('tier',))
+
+
+class Overloaded(Exception):
+    """Raised when a tier has no free slot and its queue is full or the wait timed out"""
+
+    def __init__(self, tier, retry_after):
+        super().__init__(f"The {tier} tier is at capacity, retry in {retry_after}s")
+        self.tier = tier
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Bounded concurrency with a bounded wait queue for one tier of requests.
+
+    Requests beyond max_active wait for a slot; once max_queue are waiting,
+    further requests are rejected at once instead of piling up. Retry-After is
+    estimated from the recent average time a slot is held.
+    """
+
+    def __init__(self, tier, max_active, max_queue, queue_timeout):
+        self.tier = tier
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        # Exponentially weighted average of how long a slot is held
+        self._average_hold = 1.0
+
+    def retry_after(self):
+        """Whole seconds until a slot is likely to be free"""
+        backlog = self.active + self.waiting
+        return max(1, math.ceil(self._average_hold * backlog / self.max_active))
+
+    def _publish(self):
+        ADMISSION_ACTIVE.set(self.active, tier=self.tier)
+        ADMISSION_WAITING.set(self.waiting, tier=self.tier)
+
+    def _reject(self):
+        ADMISSION_REJECTED.inc(tier=self.tier)
+        return Overloaded(self.tier, self.retry_after())
+
+    def acquire(self):
+        """Take a slot, waiting if the queue has room; raises Overloaded otherwise.
+
+        Returns a token to pass to release().
+        """
+        started = time.monotonic()
+        with self._condition:
+            if self.active < self.max_active:
+                self.active += 1
+                self._publish()
+                return started
+            if self.waiting >= self.max_queue:
+                raise self._reject()
+
+            self.waiting += 1
+            self._publish()
+            try:
+                deadline = started + self.queue_timeout
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject()
+                    self._condition.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+                self._publish()
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, tier=self.tier)
+        return time.monotonic()
+
+    def release(self, token):
+        """Return a slot taken by acquire()"""
+        held = time.monotonic() - token
+        with self._condition:
+            self.active -= 1
+            self._average_hold = 0.8 * self._average_hold + 0.2 * held
+            self._publish()
+            self._condition.notify()
+
+    def stats(self):
+        """Current occupancy, for /health"""
+        with self._condition:
+            return {'active': self.active, 'waiting': self.waiting, 'max_active': self.max_active,
+                    'max_queue': self.max_queue, 'retry_after': self.retry_after()}
+
+
+analysis_gate = AdmissionGate('analysis', ANALYSIS_MAX_CONCURRENT, ANALYSIS_MAX_QUEUE, ANALYSIS_QUEUE_TIMEOUT)
+api_gate = AdmissionGate('api', API_MAX_CONCURRENT, API_MAX_QUEUE, API_QUEUE_TIMEOUT)
+streaming_gate = AdmissionGate('streaming', STREAMING_MAX_CONCURRENT, 0, 0)
+live_gate = AdmissionGate('live', LIVE_MAX_SESSIONS, 0, 0)
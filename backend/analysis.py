@@ -0,0 +1,793 @@
+import os
+import time
+import queue
+import contextlib
+import threading
+import cv2  # pyright: ignore[reportMissingImports]
+import mediapipe as mp  # pyright: ignore[reportMissingImports]
+import numpy as np  # pyright: ignore[reportMissingImports]
+
+# Initialize MediaPipe Pose
+mp_pose = mp.solutions.pose
+
+# Number of reusable frame buffers shared between the decoder and pose stages
+FRAME_BUFFER_COUNT = 4
+
+# Named analysis profiles trading accuracy for throughput.
+# max_dimension caps the longer side of the frame fed to the pose model (None keeps
+# the source resolution) and frame_stride analyses every Nth decoded frame.
+ANALYSIS_PROFILES = {
+    'fast': {
+        'max_dimension': 320,
+        'frame_stride': 3,
+        'model_complexity': 0,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5,
+    },
+    'balanced': {
+        'max_dimension': 480,
+        'frame_stride': 2,
+        'model_complexity': 1,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5,
+    },
+    'accurate': {
+        'max_dimension': None,
+        'frame_stride': 1,
+        'model_complexity': 1,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5,
+    },
+}
+
+# Bump whenever counting, scoring or result layout changes, so cached results are not reused
+ALGORITHM_VERSION = 'exercises-4'
+
+# Server-wide default, overridable per request on /upload-video
+DEFAULT_PROFILE = os.getenv('ANALYSIS_PROFILE', 'accurate')
+
+# Form checks run once per this many source frames, independent of the stride
+FORM_CHECK_INTERVAL = 30
+
+# Analysed frames between progress callbacks
+PROGRESS_INTERVAL = 30
+
+# MediaPipe Pose landmarks per frame, each stored as (x, y, z, visibility)
+LANDMARK_COUNT = 33
+LANDMARK_FIELDS = 4
+LEFT_SHOULDER = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+LEFT_HIP = mp_pose.PoseLandmark.LEFT_HIP.value
+LEFT_KNEE = mp_pose.PoseLandmark.LEFT_KNEE.value
+
+# Motion gate: a frame whose small grey thumbnail differs from the last analysed frame's
+# in fewer than motion_threshold (a fraction) of its pixels, by more than
+# MOTION_PIXEL_DELTA grey levels, skips pose inference and reuses the previous landmarks
+MOTION_THUMBNAIL_WIDTH = 96
+MOTION_PIXEL_DELTA = 16
+# Most analysed frames in a row that may reuse landmarks before inference is forced
+MOTION_MAX_GAP = int(os.getenv('MOTION_GATE_MAX_GAP', '10'))
+
+# Longest stretch of video analysed; later frames are ignored and the result is
+# flagged partial (0 disables)
+MAX_VIDEO_SECONDS = float(os.getenv('ANALYSIS_MAX_VIDEO_SECONDS', '600'))
+# A deadline-bound analysis aims to finish within this share of its remaining time
+DEADLINE_TARGET = 0.9
+# Degradation never samples fewer analysed frames per second of video than this,
+# and never shrinks frames below this many pixels on the longer side
+MIN_ADAPTIVE_FPS = 5
+MIN_ADAPTIVE_DIMENSION = 320
+
+# Time-segment sharding: each segment after the first starts decoding this long
+# before its own range, so pose tracking and the motion gate have settled by the
+# time its frames count; shorter segments are not worth the extra seek and warm-up
+SEGMENT_OVERLAP_SECONDS = 1.0
+MIN_SEGMENT_SECONDS = 20
+
+# Sit-up counting and form thresholds; score_sit_ups accepts overrides for re-scoring
+SIT_UP_THRESHOLDS = {
+    'down_angle': 160,  # Hip angle above which the athlete is lying flat
+    'up_angle': 90,  # Hip angle below which the athlete is seated
+    'max_shoulder_hip_distance': 0.3,  # Larger distances mean excessive movement
+    'min_control_angle': 45,  # Hip angles below this on a form check are too bent
+}
+
+_END_OF_STREAM = object()
+
+
+class StageTimings:
+    """Wall-clock seconds spent in each pipeline stage (decode, resize, colour, pose, counting).
+
+    Decode, resize and colour run on the decoder thread in parallel with pose, so
+    stage totals can add up to more than the elapsed time. With keep_samples the
+    per-frame durations are kept too, for latency percentiles.
+    """
+
+    def __init__(self, keep_samples=False):
+        self.seconds = {}
+        self.counts = {}
+        self.samples = {} if keep_samples else None
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        if self.samples is not None:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def merge(self, stages):
+        """Add the output of another StageTimings.to_dict(), e.g. one returned by a pose worker"""
+        for stage, info in stages.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + info['seconds']
+            self.counts[stage] = self.counts.get(stage, 0) + info['count']
+
+    def to_dict(self):
+        """Per-stage {'seconds', 'count'} for JSON responses and reports"""
+        return {stage: {'seconds': round(seconds, 6), 'count': self.counts[stage]}
+                for stage, seconds in self.seconds.items()}
+
+
+def measure_stage(timings, stage):
+    """timings.measure(stage), or a no-op when no StageTimings is being collected"""
+    return timings.measure(stage) if timings is not None else contextlib.nullcontext()
+
+
+def get_profile(name=None):
+    """Return the settings for a named analysis profile"""
+    name = name or DEFAULT_PROFILE
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown analysis profile '{name}'. Choose one of: {', '.join(ANALYSIS_PROFILES)}")
+    return ANALYSIS_PROFILES[name]
+
+
+def create_pose(profile):
+    """Create a MediaPipe Pose instance configured for an analysis profile"""
+    return mp_pose.Pose(
+        model_complexity=profile['model_complexity'],
+        min_detection_confidence=profile['min_detection_confidence'],
+        min_tracking_confidence=profile['min_tracking_confidence'],
+    )
+
+
+def downscale(frame, max_dimension):
+    """Shrink a frame so its longer side is at most max_dimension pixels"""
+    height, width = frame.shape[:2]
+    if not max_dimension or max(height, width) <= max_dimension:
+        return frame
+    scale = max_dimension / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class MotionGate:
+    """Decide per frame whether pose inference is needed, by cheap frame differencing.
+
+    Frames are compared with the last frame that went to the pose model rather than
+    the previous one, so slow movement still adds up; max_gap bounds how many frames
+    in a row can reuse old landmarks.
+    """
+
+    def __init__(self, threshold, max_gap=MOTION_MAX_GAP):
+        self.threshold = threshold
+        self.max_gap = max(0, int(max_gap))
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.pose_seconds = 0.0
+        self._reference = None
+        self._gap = 0
+
+    def needs_inference(self, image):
+        """Whether a BGR frame has moved enough since the last analysed one"""
+        height, width = image.shape[:2]
+        size = (MOTION_THUMBNAIL_WIDTH, max(1, round(height * MOTION_THUMBNAIL_WIDTH / width)))
+        thumbnail = cv2.cvtColor(cv2.resize(image, size, interpolation=cv2.INTER_LINEAR), cv2.COLOR_BGR2GRAY)
+        if self._reference is not None and self._gap < self.max_gap:
+            changed = np.count_nonzero(cv2.absdiff(thumbnail, self._reference) > MOTION_PIXEL_DELTA)
+            if changed < self.threshold * thumbnail.size:
+                self._gap += 1
+                self.frames_skipped += 1
+                return False
+        self._reference = thumbnail
+        self._gap = 0
+        self.frames_inferred += 1
+        return True
+
+    def merge(self, other):
+        """Add another gate's counts, e.g. from one segment of a sharded analysis"""
+        self.frames_inferred += other.frames_inferred
+        self.frames_skipped += other.frames_skipped
+        self.pose_seconds += other.pose_seconds
+
+    def to_dict(self):
+        """Gate settings and savings for the analysis result"""
+        frames = self.frames_inferred + self.frames_skipped
+        per_frame = self.pose_seconds / self.frames_inferred if self.frames_inferred else 0.0
+        return {
+            'threshold': self.threshold,
+            'max_gap': self.max_gap,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'skipped_ratio': round(self.frames_skipped / frames, 3) if frames else 0.0,
+            # Skipped frames at the average cost of an inferred one
+            'estimated_seconds_saved': round(per_frame * self.frames_skipped, 3),
+        }
+
+
+class AnalysisBudget:
+    """Time budget for one analysis and a record of the sampling it actually used.
+
+    deadline is a time.time() timestamp, so the server can set it and a pose worker
+    enforce it. When the projected finish falls behind, the frame stride is doubled
+    (pose inference dominates and costs about the same at any resolution), then the
+    resolution is lowered; at the deadline, or after max_video_seconds of video,
+    analysis stops with what it has.
+    """
+
+    def __init__(self, deadline=None, max_video_seconds=MAX_VIDEO_SECONDS):
+        self.deadline = deadline
+        self.max_video_seconds = max_video_seconds
+        self.stopped_reason = None
+        self.degradations = []
+        self.initial_sampling = None
+        self.final_sampling = None
+        self.frames_read = 0
+        self.fps = 0.0
+        self._window = None
+
+    def frame_limit(self, fps):
+        """Index of the first frame past max_video_seconds, or None"""
+        if not self.max_video_seconds or not fps:
+            return None
+        return int(self.max_video_seconds * fps)
+
+    def check(self, reader):
+        """Called every few analysed frames; returns False once analysis must stop"""
+        if self.deadline is None:
+            return True
+        now = time.time()
+        if now >= self.deadline:
+            self.stopped_reason = 'deadline'
+            return False
+        if self._window is None:
+            self._window = (now, reader.frames_read)
+            return True
+
+        # Project the finish from the rate since the last change of sampling
+        window_started, window_frames = self._window
+        frames = reader.frames_read - window_frames
+        remaining = reader.frame_count_estimate - reader.frames_read
+        if frames <= 0 or remaining <= 0:
+            return True
+        projected = now + remaining * (now - window_started) / frames
+        if projected > now + (self.deadline - now) * DEADLINE_TARGET and self._degrade(reader):
+            self._window = (now, reader.frames_read)
+        return True
+
+    def _degrade(self, reader):
+        max_stride = max(reader.frame_stride, int(reader.fps // MIN_ADAPTIVE_FPS) if reader.fps else 1)
+        if reader.frame_stride < max_stride:
+            reader.frame_stride = min(reader.frame_stride * 2, max_stride)
+        elif reader.max_dimension is None or reader.max_dimension > MIN_ADAPTIVE_DIMENSION:
+            current = reader.max_dimension or reader.frame_dimension
+            reader.max_dimension = max(MIN_ADAPTIVE_DIMENSION, current // 2)
+        else:
+            return False
+        self.degradations.append({'at_frame': reader.frames_read, 'frame_stride': reader.frame_stride,
+                                  'max_dimension': reader.max_dimension})
+        return True
+
+    @property
+    def approximate(self):
+        return bool(self.degradations) or self.stopped_reason is not None
+
+    def merge(self, other, start_frame=0):
+        """Fold in the budget of the segment from start_frame on in a sharded analysis"""
+        if self.initial_sampling is None:
+            self.initial_sampling = other.initial_sampling
+        if self.final_sampling is None:
+            self.final_sampling = other.final_sampling
+        elif other.final_sampling is not None:
+            # The coarsest sampling any segment ended up with
+            dimensions = [sampling['max_dimension'] for sampling in (self.final_sampling, other.final_sampling)
+                          if sampling['max_dimension'] is not None]
+            self.final_sampling = {
+                'frame_stride': max(self.final_sampling['frame_stride'], other.final_sampling['frame_stride']),
+                'max_dimension': min(dimensions) if dimensions else None,
+            }
+        self.degradations.extend(other.degradations)
+        self.stopped_reason = self.stopped_reason or other.stopped_reason
+        self.frames_read += max(0, other.frames_read - start_frame)
+        self.fps = self.fps or other.fps
+
+    def to_dict(self, frames_analyzed):
+        """Effective sampling for the analysis result"""
+        analyzed_seconds = self.frames_read / self.fps if self.fps else 0.0
+        return {
+            'initial': self.initial_sampling,
+            'final': self.final_sampling,
+            'degradations': self.degradations,
+            'analyzed_seconds': round(analyzed_seconds, 2),
+            'effective_fps': round(frames_analyzed / analyzed_seconds, 2) if analyzed_seconds else 0.0,
+            'stopped_reason': self.stopped_reason,
+        }
+
+
+class FrameReader:
+    """Decode a video on a background thread into a bounded pool of reusable RGB buffers.
+
+    With a MotionGate, frames it rejects are yielded as (frame_index, None) without
+    colour conversion. start_frame seeks before decoding and end_frame stops before
+    that frame, for reading one segment of a video; frame indices stay absolute.
+    """
+
+    def __init__(self, video_path, frame_stride=1, max_dimension=None, buffer_count=FRAME_BUFFER_COUNT,
+                 timings=None, motion_gate=None, start_frame=0, end_frame=None):
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.frame_stride = max(1, int(frame_stride))
+        self.max_dimension = max_dimension
+        self.timings = timings
+        self.motion_gate = motion_gate
+        self.frames_read = 0
+        self.frames_decoded = 0
+        # Container-reported frame count and rate; the count is only used for sizing and progress
+        self.frame_count_estimate = 0
+        self.fps = 0.0
+        # Longer side of the source frames, once the first one is decoded
+        self.frame_dimension = 0
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = None
+
+        # Buffers are allocated lazily once the frame size is known
+        for _ in range(buffer_count):
+            self._free.put(None)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._decode, name="frame-decoder", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        """Stop the decoder thread and wait for it to release the capture"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _next_free_buffer(self):
+        # Block until the pose stage hands a buffer back, so decoding never runs
+        # more than buffer_count frames ahead
+        while not self._stop.is_set():
+            try:
+                return True, self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return False, None
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.video_path)
+        self.frame_count_estimate = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        if self.end_frame is not None:
+            self.frame_count_estimate = min(self.frame_count_estimate, self.end_frame)
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        try:
+            if self.start_frame:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+                # Some containers can only seek to a keyframe; count from where it landed
+                self.frames_read = max(0, int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+            frame = None
+            while not self._stop.is_set():
+                frame_index = self.frames_read
+                if self.end_frame is not None and frame_index >= self.end_frame:
+                    break
+                if frame_index % self.frame_stride:
+                    # Skipped frames are only grabbed, never retrieved or converted
+                    with measure_stage(self.timings, 'grab'):
+                        grabbed = cap.grab()
+                    if not grabbed:
+                        break
+                    self.frames_read += 1
+                    continue
+
+                with measure_stage(self.timings, 'decode'):
+                    ret, frame = cap.read(frame)
+                if not ret:
+                    break
+                self.frames_read += 1
+                self.frame_dimension = max(frame.shape[:2])
+
+                with measure_stage(self.timings, 'resize'):
+                    image = downscale(frame, self.max_dimension)
+                if self.motion_gate is not None:
+                    with measure_stage(self.timings, 'motion'):
+                        moved = self.motion_gate.needs_inference(image)
+                    if not moved:
+                        self._ready.put((frame_index, None))
+                        continue
+                ok, buffer = self._next_free_buffer()
+                if not ok:
+                    break
+                if buffer is None or buffer.shape != image.shape:
+                    buffer = np.empty(image.shape, dtype=np.uint8)
+
+                # Convert the BGR image to RGB for MediaPipe straight into the shared buffer
+                with measure_stage(self.timings, 'colour'):
+                    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=buffer)
+                self.frames_decoded += 1
+                self._ready.put((frame_index, buffer))
+        except Exception as e:
+            self._error = e
+        finally:
+            cap.release()
+            self._ready.put(_END_OF_STREAM)
+
+    def __iter__(self):
+        while True:
+            item = self._ready.get()
+            if item is _END_OF_STREAM:
+                break
+            frame_index, buffer = item
+            try:
+                yield frame_index, buffer
+            finally:
+                # The consumer is done with this frame, recycle the buffer
+                if buffer is not None:
+                    buffer.flags.writeable = True
+                    self._free.put(buffer)
+
+        if self._error is not None:
+            raise self._error
+
+
+# Function to calculate angle between three points
+def calculate_angle(a, b, c):
+    """Calculate the angle between three points using dot product formula"""
+    a = np.array(a)  # First point (e.g., shoulder)
+    b = np.array(b)  # Mid point (e.g., hip)
+    c = np.array(c)  # End point (e.g., knee)
+
+    # Calculate vectors
+    ba = a - b
+    bc = c - b
+
+    # Use dot product formula
+    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
+    # Clamp cosine_angle to avoid numerical errors
+    cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
+    angle = np.arccos(cosine_angle)
+
+    return np.degrees(angle)
+
+
+class LandmarkTrack:
+    """Pose landmarks of one video as a (frames, 33, 4) float32 array.
+
+    Rows hold (x, y, z, visibility) per landmark and are NaN for frames where no
+    person was detected; frame_indices maps each row to its source frame.
+    """
+
+    def __init__(self, landmarks, frame_indices, total_frames, fps=0.0):
+        self.landmarks = landmarks
+        self.frame_indices = frame_indices
+        self.total_frames = total_frames
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    @property
+    def detected(self):
+        """Boolean mask of frames with a detected person"""
+        return ~np.isnan(self.landmarks[:, 0, 0])
+
+
+def plan_segments(frame_count, fps, max_segments, overlap_seconds=SEGMENT_OVERLAP_SECONDS,
+                  min_segment_seconds=MIN_SEGMENT_SECONDS):
+    """Split a video into at most max_segments time segments for parallel analysis.
+
+    Returns (read_start, start, end) frame ranges: a segment's landmarks cover
+    [start, end) and it decodes from read_start, overlap_seconds earlier, to warm
+    up. The last segment has end None and reads to the real end of the video,
+    since the container's frame count is only an estimate.
+    """
+    if not fps or frame_count <= 0:
+        return [(0, 0, None)]
+    count = int(min(max_segments, frame_count // (min_segment_seconds * fps)))
+    if count <= 1:
+        return [(0, 0, None)]
+    overlap = int(round(overlap_seconds * fps))
+    bounds = [frame_count * index // count for index in range(count)] + [None]
+    return [(max(0, start - overlap), start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def stitch_tracks(tracks, segments):
+    """Join the LandmarkTracks of the segments from plan_segments into one track.
+
+    Each segment's warm-up frames before its start are dropped, since the previous
+    segment covered them with settled tracking. Reps are then counted over the whole
+    track, so a rep crossing a segment boundary counts exactly once.
+    """
+    landmarks, frame_indices = [], []
+    total_frames = 0
+    for track, (_, start, _) in zip(tracks, segments):
+        keep = track.frame_indices >= start
+        landmarks.append(track.landmarks[keep])
+        frame_indices.append(track.frame_indices[keep])
+        total_frames += max(0, track.total_frames - start)
+    fps = next((track.fps for track in tracks if track.fps), 0.0)
+    return LandmarkTrack(np.concatenate(landmarks), np.concatenate(frame_indices), total_frames, fps)
+
+
+def landmark_array(results):
+    """(33, 4) float32 array of (x, y, z, visibility) for a pose result, or None if nobody was found"""
+    if results.pose_landmarks is None:
+        return None
+    return np.array([(point.x, point.y, point.z, point.visibility) for point in results.pose_landmarks.landmark],
+                    dtype=np.float32)
+
+
+def extract_landmarks(video_path, profile, pose, progress_callback=None, timings=None, motion_gate=None,
+                      budget=None, start_frame=0, end_frame=None):
+    """Run pose inference over a video and collect its landmarks into a LandmarkTrack.
+
+    Pass a StageTimings to record where the time goes, a MotionGate to carry
+    landmarks forward over frames where nothing moved, and an AnalysisBudget to
+    bound the time spent (the track may then cover only part of the video).
+    start_frame and end_frame restrict the pass to one segment, see plan_segments.
+    """
+    frames_analyzed = 0
+    budget = budget or AnalysisBudget()
+    budget.initial_sampling = {'frame_stride': profile['frame_stride'], 'max_dimension': profile['max_dimension']}
+
+    with FrameReader(video_path, profile['frame_stride'], profile['max_dimension'], timings=timings,
+                     motion_gate=motion_gate, start_frame=start_frame, end_frame=end_frame) as reader:
+        landmarks = None
+        frame_indices = None
+        frame_landmarks = None
+        frame_limit = None
+        for frame_index, image in reader:
+            if frames_analyzed == 0:
+                frame_limit = budget.frame_limit(reader.fps)
+            if frame_limit is not None and frame_index >= frame_limit:
+                budget.stopped_reason = 'max_duration'
+                break
+            if landmarks is None or frames_analyzed == len(landmarks):
+                # Size from the container's frame count, growing if it was an underestimate
+                estimate = max(0, reader.frame_count_estimate - reader.start_frame) // reader.frame_stride + 1
+                capacity = max(estimate, 2 * frames_analyzed, 64)
+                grown = np.full((capacity, LANDMARK_COUNT, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+                grown_indices = np.zeros(capacity, dtype=np.int32)
+                if landmarks is not None:
+                    grown[:frames_analyzed] = landmarks[:frames_analyzed]
+                    grown_indices[:frames_analyzed] = frame_indices[:frames_analyzed]
+                landmarks, frame_indices = grown, grown_indices
+
+            # Make detection; a frame the motion gate let through keeps the previous landmarks
+            if image is not None:
+                started = time.perf_counter()
+                with measure_stage(timings, 'pose'):
+                    image.flags.writeable = False
+                    frame_landmarks = landmark_array(pose.process(image))
+                if motion_gate is not None:
+                    motion_gate.pose_seconds += time.perf_counter() - started
+
+            frame_indices[frames_analyzed] = frame_index
+            if frame_landmarks is not None:
+                landmarks[frames_analyzed] = frame_landmarks
+            frames_analyzed += 1
+
+            if frames_analyzed % PROGRESS_INTERVAL == 0:
+                if progress_callback:
+                    progress_callback(reader.frames_read, max(reader.frame_count_estimate, reader.frames_read))
+                if not budget.check(reader):
+                    break
+
+    if landmarks is None:
+        landmarks = np.full((0, LANDMARK_COUNT, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+        frame_indices = np.zeros(0, dtype=np.int32)
+    if progress_callback:
+        progress_callback(reader.frames_read, reader.frames_read)
+
+    # Frames the decoder read ahead of a stop were never analysed
+    frames_read = frame_indices[frames_analyzed - 1] + 1 if budget.stopped_reason and frames_analyzed else reader.frames_read
+    budget.frames_read = int(frames_read)
+    budget.fps = reader.fps
+    budget.final_sampling = {'frame_stride': reader.frame_stride, 'max_dimension': reader.max_dimension}
+    return LandmarkTrack(landmarks[:frames_analyzed], frame_indices[:frames_analyzed], budget.frames_read, reader.fps)
+
+
+def joint_angles(a, b, c):
+    """Vectorised calculate_angle: angle at b in degrees for (n, 2) point arrays"""
+    ba = a - b
+    bc = c - b
+    cosine_angle = np.sum(ba * bc, axis=1) / (np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1))
+    return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
+
+
+def count_hysteresis_reps(values, enter_threshold, exit_threshold):
+    """Count 'down' (value > enter_threshold) to 'up' (value < exit_threshold) transitions.
+
+    Matches the frame-by-frame state machine: a frame below exit_threshold counts a
+    rep only if the most recent state-changing frame before it was a 'down' frame.
+    Returns (rep_count, positions of the counting frames, final stage).
+    """
+    events = np.zeros(len(values), dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        events[values > enter_threshold] = 1
+        events[values < exit_threshold] = -1
+    positions = np.flatnonzero(events)
+    sequence = events[positions]
+
+    counted = np.flatnonzero((sequence[:-1] == 1) & (sequence[1:] == -1)) + 1
+    rep_positions = positions[counted]
+
+    downs = np.flatnonzero(sequence == 1)
+    if len(downs) == 0:
+        stage = None
+    elif np.any(sequence[downs[-1]:] == -1):
+        stage = 'up'
+    else:
+        stage = 'down'
+    return len(rep_positions), rep_positions, stage
+
+
+def sit_up_series(track):
+    """Per-frame hip angle and shoulder-hip distance for the left side of the body"""
+    shoulder = track.landmarks[:, LEFT_SHOULDER, :2].astype(np.float64)
+    hip = track.landmarks[:, LEFT_HIP, :2].astype(np.float64)
+    knee = track.landmarks[:, LEFT_KNEE, :2].astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        angles = joint_angles(shoulder, hip, knee)
+    distances = np.linalg.norm(shoulder - hip, axis=1)
+    return angles, distances
+
+
+def score_sit_ups(track, thresholds=None):
+    """Count sit-ups and collect form feedback from a LandmarkTrack with whole-array operations"""
+    thresholds = {**SIT_UP_THRESHOLDS, **(thresholds or {})}
+    angles, distances = sit_up_series(track)
+    detected = track.detected
+
+    sit_up_count, _, _ = count_hysteresis_reps(angles, thresholds['down_angle'], thresholds['up_angle'])
+    valid_reps = sit_up_count  # For now, count all as valid
+
+    # Feedback, in frame order: the movement hint on any frame with excessive
+    # shoulder-hip distance, then the control hint on form-check frames (the first
+    # detected frame of each FORM_CHECK_INTERVAL window) that are very bent
+    with np.errstate(invalid='ignore'):
+        core = detected & (distances > thresholds['max_shoulder_hip_distance'])
+    buckets = (track.frame_indices[detected] + 1) // FORM_CHECK_INTERVAL
+    checks = np.flatnonzero(detected)[buckets > np.concatenate(([0], buckets[:-1]))]
+    with np.errstate(invalid='ignore'):
+        control = checks[angles[checks] < thresholds['min_control_angle']]
+
+    hint_keys = np.sort(np.concatenate((np.flatnonzero(core) * 2, control * 2 + 1)))[:3]
+    feedback = [SitUpCounter.CONTROL_HINT if key % 2 else SitUpCounter.CORE_HINT for key in hint_keys]
+
+    form_score = min(100, (valid_reps / sit_up_count) * 100) if sit_up_count > 0 else 0
+    return {
+        'sit_up_count': sit_up_count,
+        'form_score': int(form_score),
+        'feedback': feedback,
+    }
+
+
+class SitUpCounter:
+    """Incremental sit-up state machine for live analysis; score_sit_ups is its batch equivalent"""
+
+    CORE_HINT = "Keep your core engaged and maintain steady movement"
+    CONTROL_HINT = "Try to maintain a more controlled movement"
+
+    def __init__(self, thresholds=None):
+        self.thresholds = {**SIT_UP_THRESHOLDS, **(thresholds or {})}
+        self.sit_up_count = 0
+        self.stage = None  # 'up' or 'down'
+        self.valid_reps = 0
+        self.feedback = []
+        self.angle = None
+        self._last_form_check = 0
+
+    def _add_feedback(self, hint):
+        if len(self.feedback) < 3:  # Limit feedback messages
+            self.feedback.append(hint)
+
+    def update(self, landmarks, frame_index):
+        """Feed one frame's pose landmarks; returns the form hints raised by this frame"""
+        hints = []
+
+        # Get coordinates for sit-up analysis
+        # Using left side landmarks for consistency
+        shoulder = [landmarks[LEFT_SHOULDER].x, landmarks[LEFT_SHOULDER].y]
+        hip = [landmarks[LEFT_HIP].x, landmarks[LEFT_HIP].y]
+        knee = [landmarks[LEFT_KNEE].x, landmarks[LEFT_KNEE].y]
+
+        # Calculate the hip angle (important for sit-ups)
+        angle = calculate_angle(shoulder, hip, knee)
+        self.angle = angle
+
+        # Sit-up counting logic
+        if angle > self.thresholds['down_angle']:  # "down" stage (lying flat)
+            self.stage = "down"
+        elif angle < self.thresholds['up_angle'] and self.stage == 'down':  # "up" stage (seated)
+            self.stage = "up"
+            self.sit_up_count += 1
+            self.valid_reps += 1  # For now, count all as valid
+
+        # Basic form analysis
+        # Check if person is maintaining proper alignment
+        shoulder_hip_distance = np.linalg.norm(np.array(shoulder) - np.array(hip))
+        if shoulder_hip_distance > self.thresholds['max_shoulder_hip_distance']:  # Excessive movement
+            hints.append(self.CORE_HINT)
+
+        # Check for consistent form once per FORM_CHECK_INTERVAL source frames,
+        # so skipped frames never hide a check
+        form_check = (frame_index + 1) // FORM_CHECK_INTERVAL
+        if form_check > self._last_form_check:
+            self._last_form_check = form_check
+            if angle < self.thresholds['min_control_angle']:  # Very bent position
+                hints.append(self.CONTROL_HINT)
+
+        for hint in hints:
+            self._add_feedback(hint)
+        return hints
+
+    def form_score(self):
+        """Share of counted reps judged valid, as a percentage"""
+        if self.sit_up_count > 0:
+            return int(min(100, (self.valid_reps / self.sit_up_count) * 100))
+        return 0
+
+    def result(self):
+        return {
+            'sit_up_count': self.sit_up_count,
+            'form_score': self.form_score(),
+            'feedback': self.feedback[:3],  # Limit to 3 feedback items
+        }
+
+
+def analyze_sit_ups(video_path, profile_name=None, pose=None, progress_callback=None, timings=None,
+                    motion_threshold=None, deadline=None):
+    """Analyze sit-ups in the video using MediaPipe pose detection.
+
+    Pass an already-initialised Pose instance (see pose_pool.py) to skip model
+    load; otherwise a new one is created for this video. progress_callback, if
+    given, is called as progress_callback(frames_processed, total_frames).
+    timings, a StageTimings, collects per-stage durations. A motion_threshold
+    enables the MotionGate; a deadline (time.time() timestamp) bounds the run,
+    see AnalysisBudget.
+    """
+    profile = get_profile(profile_name)
+    pose_context = contextlib.nullcontext(pose) if pose is not None else create_pose(profile)
+    motion_gate = MotionGate(motion_threshold) if motion_threshold else None
+    budget = AnalysisBudget(deadline)
+
+    # Single pass: the decoder thread fills frame buffers while the pose stage consumes them
+    with pose_context as pose:
+        track = extract_landmarks(video_path, profile, pose, progress_callback, timings, motion_gate, budget)
+
+    with measure_stage(timings, 'counting'):
+        result = score_sit_ups(track)
+    result.update({
+        'total_frames': track.total_frames,
+        'frames_analyzed': len(track),
+        'profile': profile_name or DEFAULT_PROFILE,
+        'sampling': budget.to_dict(len(track)),
+        'approximate': budget.approximate,
+    })
+    if motion_gate is not None:
+        result['motion_gate'] = motion_gate.to_dict()
+    return result
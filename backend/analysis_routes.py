@@ -0,0 +1,411 @@
+# Video analysis routes: uploads, analysis jobs and live analysis. Importing this
+# module loads the vision stack (OpenCV, MediaPipe, NumPy), so create_app only
+# imports it when the app serves analysis.
+
+import os
+import time
+import hashlib
+import tempfile
+from flask import Blueprint, request, jsonify  # pyright: ignore[reportMissingImports]
+from flask_sock import Sock  # pyright: ignore[reportMissingImports]
+from analysis import ALGORITHM_VERSION, DEFAULT_PROFILE, StageTimings, get_profile
+from pose_pool import analyze_in_pool, warm_up_pool
+from exercises import motion_threshold_for, parse_exercise_types
+from job_queue import job_queue
+from result_cache import make_cache_key, result_cache, save_upload_with_hash
+from chunked_upload import chunked_uploads, UploadOffsetError
+from landmark_store import PERSIST_LANDMARK_TRACKS, move_track, track_path, track_reference
+from landmark_stream import analyze_landmark_stream, read_stream
+from live_analysis import handle_live_connection
+from metrics import UPLOAD_SECONDS
+from request_utils import is_truthy
+
+# Seconds a synchronous analysis may take once its upload has arrived, including the
+# wait for a pose worker; past it sampling degrades and the result is approximate.
+# Clients can ask for less (or more, up to the maximum) with deadline_seconds.
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_DEADLINE_SECONDS', '120'))
+ANALYSIS_MAX_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_MAX_DEADLINE_SECONDS', '600'))
+
+analysis = Blueprint('analysis', __name__)
+sock = Sock()  # WebSocket routes
+
+def warm_up():
+    """Start the pose worker pool and wait until every worker has loaded its model"""
+    started = time.perf_counter()
+    warm_up_pool()
+    print(f"🔥 Pose workers warmed up in {time.perf_counter() - started:.1f}s")
+
+def build_timing_info(timings, started):
+    """Per-request timing breakdown for /upload-video responses with timing=true"""
+    return {"total_seconds": round(time.perf_counter() - started, 4), "stages": timings.to_dict()}
+
+def build_cache_info(tier):
+    """Describe whether a result came from the analysis cache"""
+    return {
+        "hit": tier is not None,
+        "tier": tier,
+        "stats": result_cache.stats()
+    }
+
+def build_analysis_response(analysis_result):
+    """Shape an analysis result into the /upload-video response body"""
+    exercises = analysis_result['exercises']
+    response_message = " ".join(exercise['summary'] for exercise in exercises.values())
+    
+    if analysis_result['feedback']:
+        response_message += " Tips: " + "; ".join(analysis_result['feedback'])
+    
+    return {
+        "score": analysis_result['form_score'],
+        "message": response_message,
+        "sit_up_count": analysis_result['sit_up_count'],
+        "feedback": analysis_result['feedback'],
+        "profile": analysis_result['profile'],
+        "exercise_types": analysis_result['exercise_types'],
+        "exercises": {
+            name: {key: value for key, value in exercise.items() if key != 'summary'}
+            for name, exercise in exercises.items()
+        },
+        "landmark_track": analysis_result.get('landmark_track'),
+        "motion_gate": analysis_result.get('motion_gate'),
+        "sampling": analysis_result.get('sampling'),
+        "approximate": analysis_result.get('approximate', False)
+    }
+
+def wants_landmark_track(value):
+    """Whether to persist the landmark track: per request (persist_track=true) or server-wide"""
+    return PERSIST_LANDMARK_TRACKS or is_truthy(value)
+
+def parse_motion_threshold(value, gate, exercise_types):
+    """Motion gate threshold for a request, or None to analyse every frame.
+
+    motion_threshold sets it (a fraction between 0 and 1, 0 disables); motion_gate=true
+    alone uses the requested exercises' own thresholds.
+    """
+    if value is None or str(value).strip() == '':
+        return motion_threshold_for(exercise_types) if is_truthy(gate) else None
+    try:
+        threshold = float(value)
+    except ValueError:
+        raise ValueError("motion_threshold must be a number between 0 and 1")
+    if not 0 <= threshold <= 1:
+        raise ValueError("motion_threshold must be a number between 0 and 1")
+    # 0 is the default, ungated analysis and shares its cache entries
+    return threshold or None
+
+def parse_deadline_seconds(value):
+    """Parse an optional deadline_seconds value, falling back to the server default"""
+    if value is None or str(value).strip() == '':
+        return ANALYSIS_DEADLINE_SECONDS
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise ValueError("deadline_seconds must be a positive number")
+    if not seconds > 0:
+        raise ValueError("deadline_seconds must be a positive number")
+    return min(seconds, ANALYSIS_MAX_DEADLINE_SECONDS)
+
+def stored_track_reference(content_hash, profile_name):
+    """Reference of an already persisted track, if there is one"""
+    if os.path.exists(track_path(content_hash, profile_name)):
+        return track_reference(content_hash, profile_name)
+    return None
+
+@analysis.route("/upload-video", methods=["POST"])
+def upload_video():
+    """Handle video upload and analysis.
+
+    With async=true the video is queued and a job id is returned immediately;
+    poll /analysis-jobs/<job_id> for progress and the result.
+    """
+    tmp_path = None
+    started = time.perf_counter()
+    timings = StageTimings()
+    try:
+        if 'video' not in request.files:
+            return jsonify({"error": "No video file provided"}), 400
+        
+        f = request.files['video']
+        if f.filename == '':
+            return jsonify({"error": "No video file selected"}), 400
+
+        # Optional analysis profile (fast, balanced, accurate); falls back to the server default
+        profile_name = request.form.get('profile') or DEFAULT_PROFILE
+        try:
+            get_profile(profile_name)
+            # One or more comma-separated exercises, all scored from a single pose pass
+            exercise_types = parse_exercise_types(request.form.get('exercise_type'))
+            # Opt-in motion gate: skip pose inference on frames that barely changed
+            motion_threshold = parse_motion_threshold(request.form.get('motion_threshold'),
+                                                      request.form.get('motion_gate'), exercise_types)
+            # Time budget for a synchronous analysis
+            deadline_seconds = parse_deadline_seconds(request.form.get('deadline_seconds'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        run_async = is_truthy(request.form.get('async', ''))
+        # Optional per-stage timing breakdown in the response
+        include_timing = is_truthy(request.form.get('timing', request.args.get('timing', '')))
+        if run_async:
+            # Keep the upload on disk until the job worker has analysed it
+            tmp_path = job_queue.new_video_path()
+        else:
+            # Save uploaded file temporarily
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+            tmp_path = tmp.name
+            tmp.close()
+        
+        # Hash the bytes while streaming them to disk; repeat uploads are served from the cache
+        with timings.measure('upload'):
+            content_hash = save_upload_with_hash(f, tmp_path)
+        UPLOAD_SECONDS.observe(timings.seconds['upload'])
+        cache_key = make_cache_key(content_hash, profile_name, ALGORITHM_VERSION, exercise_types, motion_threshold)
+        track_key = content_hash if wants_landmark_track(request.form.get('persist_track', '')) else None
+        with timings.measure('cache_lookup'):
+            cached_result, cache_tier = result_cache.get(cache_key)
+        if cached_result is not None:
+            response = build_analysis_response(cached_result)
+            response["cache"] = build_cache_info(cache_tier)
+            if track_key:
+                response["landmark_track"] = stored_track_reference(content_hash, profile_name)
+            if include_timing:
+                response["timing"] = build_timing_info(timings, started)
+            return jsonify(response)
+
+        if run_async:
+            job_id = job_queue.submit(
+                tmp_path,
+                profile_name,
+                user_id=request.form.get('user_id', type=int),
+                save_session=is_truthy(request.form.get('save_session', '')),
+                cache_key=cache_key,
+                exercise_types=exercise_types,
+                track_key=track_key,
+                motion_threshold=motion_threshold
+            )
+            # The job now owns the upload
+            tmp_path = None
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/analysis-jobs/{job_id}"
+            }), 202
+        
+        # Analyze the video on a warm pose worker
+        analysis_result = analyze_in_pool(tmp_path, profile_name, exercise_types=exercise_types, track_key=track_key,
+                                          timings=timings, motion_threshold=motion_threshold,
+                                          deadline=time.time() + deadline_seconds)
+        with timings.measure('cache_store'):
+            result_cache.put(cache_key, analysis_result)
+        
+        response = build_analysis_response(analysis_result)
+        response["cache"] = build_cache_info(None)
+        if include_timing:
+            response["timing"] = build_timing_info(timings, started)
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
+    finally:
+        # Clean up temporary file, regardless of whether analysis succeeded or failed
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+@analysis.route("/upload-landmarks", methods=["POST"])
+def upload_landmarks():
+    """Score landmarks from on-device pose estimation instead of a video.
+
+    Expects a 'landmarks' file in the stream format of landmark_stream.py and the
+    same exercise_type and persist_track fields as /upload-video; the response has
+    the same shape. No video is decoded, so this is answered without a pose worker.
+    """
+    try:
+        if 'landmarks' not in request.files:
+            return jsonify({"error": "No landmarks file provided"}), 400
+
+        try:
+            exercise_types = parse_exercise_types(request.form.get('exercise_type'))
+            data = read_stream(request.files['landmarks'])
+            content_hash = hashlib.sha256(data).hexdigest()
+            track_key = content_hash if wants_landmark_track(request.form.get('persist_track', '')) else None
+            analysis_result = analyze_landmark_stream(data, exercise_types, track_key)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(build_analysis_response(analysis_result))
+
+    except Exception as e:
+        return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
+
+@analysis.route("/analysis-jobs/<job_id>", methods=["GET"])
+def get_analysis_job(job_id):
+    """Get status, progress and (once finished) the result of an analysis job"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        
+        if job['result'] is not None:
+            session_saved = job['result'].get('session_saved')
+            job['result'] = build_analysis_response(job['result'])
+            if session_saved is not None:
+                job['result']['session_saved'] = session_saved
+        return jsonify(job)
+        
+    except Exception as e:
+        return jsonify({"error": f"Job lookup failed: {str(e)}"}), 500
+
+@analysis.route("/analysis-jobs/<job_id>/result", methods=["GET"])
+def get_analysis_job_result(job_id):
+    """Get the final result of an analysis job in the same shape as /upload-video"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        
+        if job['status'] == 'completed':
+            return jsonify(build_analysis_response(job['result']))
+        if job['status'] == 'failed':
+            return jsonify({"error": f"Analysis failed: {job['error']}"}), 500
+        return jsonify({"status": job['status'], "progress": job['progress']}), 202
+        
+    except Exception as e:
+        return jsonify({"error": f"Job lookup failed: {str(e)}"}), 500
+
+# Chunked, resumable uploads
+@analysis.route("/uploads", methods=["POST"])
+def create_chunked_upload():
+    """Start a chunked upload; send chunks to /uploads/<upload_id>?offset=N"""
+    try:
+        data = request.get_json(silent=True) or {}
+        profile_name = data.get('profile') or DEFAULT_PROFILE
+        try:
+            get_profile(profile_name)
+            exercise_types = parse_exercise_types(data.get('exercise_type'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        session = chunked_uploads.create(profile_name, exercise_types, data.get('total_size'),
+                                         wants_landmark_track(data.get('persist_track', '')))
+        response = session.to_dict()
+        response["chunk_url"] = f"/uploads/{session.upload_id}"
+        return jsonify(response), 201
+        
+    except Exception as e:
+        return jsonify({"error": f"Upload creation failed: {str(e)}"}), 500
+
+@analysis.route("/uploads/<upload_id>", methods=["GET"])
+def get_chunked_upload(upload_id):
+    """Report the last confirmed offset so an interrupted upload can resume"""
+    session = chunked_uploads.get(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(session.to_dict())
+
+@analysis.route("/uploads/<upload_id>", methods=["PUT", "PATCH"])
+def append_chunked_upload(upload_id):
+    """Append the request body at the given offset"""
+    try:
+        session = chunked_uploads.get(upload_id)
+        if session is None:
+            return jsonify({"error": "Upload not found"}), 404
+        
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({"error": "offset query parameter is required"}), 400
+        
+        try:
+            new_offset = chunked_uploads.append(session, offset, request.stream)
+        except UploadOffsetError as e:
+            return jsonify({"error": str(e), "offset": e.current_offset}), 409
+        except ValueError as e:
+            return jsonify({"error": str(e), "offset": session.offset}), 413
+        
+        return jsonify({"offset": new_offset, "streaming_analysis": session.to_dict()['streaming_analysis']})
+        
+    except Exception as e:
+        return jsonify({"error": f"Chunk upload failed: {str(e)}"}), 500
+
+@analysis.route("/uploads/<upload_id>", methods=["DELETE"])
+def discard_chunked_upload(upload_id):
+    """Abandon an upload and delete its data"""
+    session = chunked_uploads.get(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    chunked_uploads.discard(session)
+    return jsonify({"success": True})
+
+@analysis.route("/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_chunked_upload(upload_id):
+    """Complete an upload and return its analysis (or a job id with async=true)"""
+    session = chunked_uploads.get(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    
+    try:
+        if session.total_size is not None and session.offset != session.total_size:
+            return jsonify({
+                "error": f"Upload incomplete: received {session.offset} of {session.total_size} bytes",
+                "offset": session.offset
+            }), 409
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            deadline_seconds = parse_deadline_seconds(data.get('deadline_seconds'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        content_hash = chunked_uploads.finalize(session)
+        cache_key = make_cache_key(content_hash, session.profile, ALGORITHM_VERSION, session.exercise_types)
+        track_key = content_hash if session.persist_track else None
+        cached_result, cache_tier = result_cache.get(cache_key)
+        if cached_result is not None:
+            chunked_uploads.discard(session)
+            response = build_analysis_response(cached_result)
+            response["cache"] = build_cache_info(cache_tier)
+            if track_key:
+                response["landmark_track"] = stored_track_reference(content_hash, session.profile)
+            return jsonify(response)
+        
+        if is_truthy(data.get('async', '')) and session.streaming is None:
+            video_path = job_queue.new_video_path()
+            os.replace(session.data_path, video_path)
+            chunked_uploads.discard(session)
+            job_id = job_queue.submit(
+                video_path,
+                session.profile,
+                user_id=data.get('user_id'),
+                save_session=is_truthy(data.get('save_session', '')),
+                cache_key=cache_key,
+                exercise_types=session.exercise_types,
+                track_key=track_key
+            )
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/analysis-jobs/{job_id}"
+            }), 202
+        
+        # Use the analysis that ran while the upload was arriving, if it succeeded
+        analysis_result = session.streaming.wait() if session.streaming else None
+        streamed = analysis_result is not None
+        if analysis_result is not None and analysis_result.get('landmark_track'):
+            analysis_result['landmark_track'] = move_track(session.upload_id, content_hash, session.profile)
+        if analysis_result is None:
+            analysis_result = analyze_in_pool(session.data_path, session.profile,
+                                              exercise_types=session.exercise_types, track_key=track_key,
+                                              deadline=time.time() + deadline_seconds)
+        result_cache.put(cache_key, analysis_result)
+        chunked_uploads.discard(session)
+        
+        response = build_analysis_response(analysis_result)
+        response["cache"] = build_cache_info(None)
+        response["streamed"] = streamed
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
+
+@sock.route("/live-analysis", bp=analysis)
+def live_analysis(ws):
+    """Real-time rep counting over a WebSocket; send encoded frames, receive live updates"""
+    handle_live_connection(ws, request.args.get('profile'))
@@ -0,0 +1,556 @@
+# Lightweight API routes: accounts, sessions, exercise history and dashboards. Only
+# the database layer is imported here, so API-only processes start without the
+# vision stack.
+
+import os
+import hashlib
+import secrets
+import json
+import base64
+import binascii
+import re
+import datetime
+from functools import wraps
+from flask import Blueprint, g, request, jsonify  # pyright: ignore[reportMissingImports]
+from database import db
+from session_store import session_store
+from request_utils import is_truthy
+
+api = Blueprint('api', __name__)
+
+# Page size of /get-user-history when no limit is given, and the largest allowed
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+# Largest number of sessions accepted by one /save-exercise-sessions request
+BULK_SESSION_MAX_ITEMS = int(os.getenv('BULK_SESSION_MAX_ITEMS', '500'))
+# exercise_sessions column sizes, checked per item so one oversized value does not fail the batch
+BULK_SESSION_MAX_LENGTHS = {'exercise_type': 50, 'video_path': 500, 'feedback': 1000}
+
+def request_session_token():
+    """Session token from an 'Authorization: Bearer' header, X-Session-Token, or the JSON body"""
+    auth = request.headers.get('Authorization', '')
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    token = request.headers.get('X-Session-Token')
+    if token:
+        return token.strip()
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        return str(data.get('session_token', '')).strip()
+    return ''
+
+def require_session(view):
+    """Reject requests without a valid session token; the owner's id is put in g.user_id"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session_store.validate(request_session_token())
+        if user_id is None:
+            return jsonify({"success": False, "message": "Invalid or expired session"}), 401
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+def parse_client_datetime(value):
+    """Parse an ISO 8601 timestamp from a client into naive server-local time, like GETDATE()"""
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+# created_at as the history query returns it for cursors: all 7 fractional digits of
+# DATETIME2, which pyodbc's datetime (microseconds) would truncate
+HISTORY_CURSOR_TIME = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,7})?$')
+
+def encode_history_cursor(row):
+    """Opaque keyset cursor pointing just past a history row (needs its cursor_created_at)"""
+    payload = json.dumps([row['cursor_created_at'], row['id']])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    """Inverse of encode_history_cursor; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not HISTORY_CURSOR_TIME.match(created_at):
+            raise ValueError(created_at)
+        return created_at, int(row_id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+def build_dashboard_summary(user_id, today, days=7):
+    """DashboardData (types/ExerciseData.ts) computed from exercise_daily_rollups.
+
+    Two queries, each reading one row per active day or per exercise, however many
+    sessions the user has.
+    """
+    per_day = db.execute_query("""
+    SELECT activity_date, SUM(active_session_count) AS active_sessions, SUM(total_reps) AS total_reps
+    FROM exercise_daily_rollups
+    WHERE user_id = ? AND activity_date <= ?
+    GROUP BY activity_date
+    ORDER BY activity_date DESC
+    """, (user_id, today))
+    per_exercise = db.execute_query("""
+    SELECT exercise_type, SUM(active_session_count) AS active_sessions, SUM(total_reps) AS total_reps,
+           SUM(active_form_score_sum) AS form_score_sum
+    FROM exercise_daily_rollups
+    WHERE user_id = ?
+    GROUP BY exercise_type
+    """, (user_id,))
+    if per_day is None or per_exercise is None:
+        return None
+
+    total_sessions = sum(row['active_sessions'] for row in per_exercise)
+    total_reps = sum(row['total_reps'] for row in per_exercise)
+    form_score_sum = sum(row['form_score_sum'] for row in per_exercise)
+
+    # Consecutive days with real activity, counting back from today (as DataManager.calculateStreak)
+    streak = 0
+    for row in per_day:
+        if not row['active_sessions']:
+            continue
+        if (today - row['activity_date']).days != streak:
+            break
+        streak += 1
+
+    reps_by_day = {row['activity_date']: row['total_reps'] for row in per_day}
+    weekly_progress = []
+    for offset in range(days - 1, -1, -1):
+        day = today - datetime.timedelta(days=offset)
+        reps = reps_by_day.get(day, 0)
+        weekly_progress.append({"x": day.strftime('%a'), "y": reps, "label": f"{reps} reps",
+                                "metadata": {"date": day.isoformat()}})
+
+    exercise_comparison = []
+    for row in per_exercise:
+        if not row['active_sessions']:
+            continue
+        average = round(row['total_reps'] / row['active_sessions'])
+        exercise_comparison.append({"x": row['exercise_type'], "y": average, "label": f"{average} avg reps"})
+
+    return {
+        "totalSessions": total_sessions,
+        "totalReps": total_reps,
+        "averageAccuracy": round(form_score_sum / total_sessions) if total_sessions else 0,
+        "currentStreak": streak,
+        "weeklyProgress": weekly_progress,
+        "exerciseComparison": exercise_comparison
+    }
+
+def parse_bulk_sessions():
+    """Read a bulk upload body: a JSON array, {"sessions": [...]}, or NDJSON (one session per line).
+
+    Returns a list of (session, error) pairs so a bad line only rejects that item.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append((json.loads(line), None))
+            except ValueError as e:
+                items.append((None, f"Invalid JSON line: {e}"))
+        return items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('sessions')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of sessions, {\"sessions\": [...]}, or NDJSON")
+    return [(item, None) for item in data]
+
+def validate_bulk_session(item):
+    """Normalise one bulk session item into insert_exercise_sessions_bulk's row format"""
+    if not isinstance(item, dict):
+        raise ValueError("Session must be a JSON object")
+    if not item.get('user_id'):
+        raise ValueError("User ID is required")
+
+    client_session_id = item.get('client_session_id')
+    if client_session_id is not None:
+        client_session_id = str(client_session_id).strip()
+        if not client_session_id or len(client_session_id) > 64:
+            raise ValueError("client_session_id must be 1-64 characters")
+
+    created_at = parse_client_datetime(item.get('created_at'))
+
+    feedback = item.get('feedback', '')
+    if isinstance(feedback, list):
+        feedback = "; ".join(str(tip) for tip in feedback)
+
+    session = {
+        'user_id': int(item['user_id']),
+        'exercise_type': item.get('exercise_type', 'sit-ups'),
+        'video_path': item.get('video_path', ''),
+        'sit_up_count': int(item.get('sit_up_count', 0)),
+        'form_score': int(item.get('form_score', 0)),
+        'feedback': feedback,
+        'client_session_id': client_session_id,
+        'created_at': created_at or None,
+    }
+    for column, max_length in BULK_SESSION_MAX_LENGTHS.items():
+        if session[column] is not None and len(str(session[column])) > max_length:
+            raise ValueError(f"{column} must be at most {max_length} characters")
+    return session
+
+# Authentication endpoints
+@api.route("/register", methods=["POST"])
+def register():
+    """Register a new user"""
+    try:
+        data = request.get_json()
+        username = data.get('username', '').strip()
+        password = data.get('password', '').strip()
+        email = data.get('email', '').strip()
+        
+        if not username or not password or not email:
+            return jsonify({"success": False, "message": "All fields are required"}), 400
+        
+        if len(password) < 6:
+            return jsonify({"success": False, "message": "Password must be at least 6 characters long"}), 400
+        
+        # Hash the password
+        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        
+        # Check if user already exists
+        check_user_query = "SELECT id FROM users WHERE username = ? OR email = ?"
+        existing_user = db.execute_query(check_user_query, (username, email))
+        
+        if existing_user:
+            return jsonify({"success": False, "message": "Username or email already exists"}), 400
+        
+        # Insert new user
+        insert_user_query = """
+        INSERT INTO users (username, password, email) 
+        VALUES (?, ?, ?)
+        """
+        
+        if db.execute_update(insert_user_query, (username, hashed_password, email)):
+            return jsonify({"success": True, "message": "User registered successfully"})
+        else:
+            return jsonify({"success": False, "message": "Registration failed"}), 500
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Registration error: {str(e)}"}), 500
+
+@api.route("/complete-profile", methods=["POST"])
+def complete_profile():
+    """Complete user profile with detailed information"""
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        
+        if not user_id:
+            return jsonify({"success": False, "message": "User ID is required"}), 400
+        
+        # Extract profile data
+        profile_data = {
+            'first_name': data.get('first_name', '').strip(),
+            'last_name': data.get('last_name', '').strip(),
+            'age': data.get('age'),
+            'gender': data.get('gender', '').strip(),
+            'height': data.get('height'),
+            'weight': data.get('weight'),
+            'fitness_level': data.get('fitness_level', '').strip(),
+            'health_issues': data.get('health_issues', '').strip(),
+            'fitness_goals': data.get('fitness_goals', '').strip(),
+            'emergency_contact': data.get('emergency_contact', '').strip(),
+            'phone': data.get('phone', '').strip()
+        }
+        
+        # Update user profile
+        update_query = """
+        UPDATE users SET 
+            first_name = ?, last_name = ?, age = ?, gender = ?, 
+            height = ?, weight = ?, fitness_level = ?, health_issues = ?, 
+            fitness_goals = ?, emergency_contact = ?, phone = ?, 
+            profile_completed = 1, updated_at = GETDATE()
+        WHERE id = ?
+        """
+        
+        if db.execute_update(update_query, (
+            profile_data['first_name'], profile_data['last_name'], profile_data['age'],
+            profile_data['gender'], profile_data['height'], profile_data['weight'],
+            profile_data['fitness_level'], profile_data['health_issues'], 
+            profile_data['fitness_goals'], profile_data['emergency_contact'],
+            profile_data['phone'], user_id
+        )):
+            return jsonify({"success": True, "message": "Profile completed successfully"})
+        else:
+            return jsonify({"success": False, "message": "Failed to update profile"}), 500
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Profile update error: {str(e)}"}), 500
+
+@api.route("/get-user-profile/<int:user_id>", methods=["GET"])
+def get_user_profile(user_id):
+    """Get detailed user profile"""
+    try:
+        profile_query = """
+        SELECT id, username, email, first_name, last_name, age, gender, 
+               height, weight, fitness_level, health_issues, fitness_goals, 
+               emergency_contact, phone, profile_completed, created_at
+        FROM users WHERE id = ?
+        """
+        
+        profile = db.execute_query(profile_query, (user_id,))
+        
+        if profile:
+            return jsonify({"success": True, "profile": profile[0]})
+        else:
+            return jsonify({"success": False, "message": "User not found"}), 404
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Profile fetch error: {str(e)}"}), 500
+
+@api.route("/login", methods=["POST"])
+def login():
+    """Login user"""
+    try:
+        data = request.get_json()
+        username = data.get('username', '').strip()
+        password = data.get('password', '').strip()
+        
+        if not username or not password:
+            return jsonify({"success": False, "message": "Username and password are required"}), 400
+        
+        # Hash the password
+        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        
+        # Check user credentials
+        login_query = "SELECT id, username, email FROM users WHERE username = ? AND password = ?"
+        user = db.execute_query(login_query, (username, hashed_password))
+        
+        if user:
+            # Create session token
+            session_token = secrets.token_urlsafe(32)
+            expires_at = datetime.datetime.now() + datetime.timedelta(hours=24)
+            
+            # Store session
+            session_query = """
+            INSERT INTO user_sessions (user_id, session_token, expires_at) 
+            VALUES (?, ?, ?)
+            """
+            
+            if db.execute_update(session_query, (user[0]['id'], session_token, expires_at)):
+                session_store.remember(session_token, user[0]['id'], expires_at)
+                return jsonify({
+                    "success": True, 
+                    "message": "Login successful",
+                    "user": {
+                        "id": user[0]['id'],
+                        "username": user[0]['username'],
+                        "email": user[0]['email']
+                    },
+                    "session_token": session_token
+                })
+            else:
+                return jsonify({"success": False, "message": "Session creation failed"}), 500
+        else:
+            return jsonify({"success": False, "message": "Invalid username or password"}), 401
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Login error: {str(e)}"}), 500
+
+@api.route("/logout", methods=["POST"])
+def logout():
+    """Logout user"""
+    try:
+        data = request.get_json()
+        session_token = data.get('session_token', '')
+        
+        if session_token:
+            # Remove session; the cache is invalidated after the delete commits, so a
+            # concurrent validation cannot re-read the row and cache it again
+            logout_query = "DELETE FROM user_sessions WHERE session_token = ?"
+            db.execute_update(logout_query, (session_token,))
+            session_store.invalidate(session_token)
+        
+        return jsonify({"success": True, "message": "Logged out successfully"})
+        
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Logout error: {str(e)}"}), 500
+
+@api.route("/validate-session", methods=["GET", "POST"])
+@require_session
+def validate_session():
+    """Check a session token and return the user it belongs to"""
+    return jsonify({"success": True, "user_id": g.user_id})
+
+@api.route("/save-exercise-session", methods=["POST"])
+def save_exercise_session():
+    """Save exercise session data"""
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        exercise_type = data.get('exercise_type', 'sit-ups')
+        video_path = data.get('video_path', '')
+        sit_up_count = data.get('sit_up_count', 0)
+        form_score = data.get('form_score', 0)
+        feedback = data.get('feedback', '')
+        
+        if not user_id:
+            return jsonify({"success": False, "message": "User ID is required"}), 400
+        
+        # Save exercise session
+        if db.insert_exercise_session(user_id, exercise_type, video_path, sit_up_count, form_score, feedback):
+            return jsonify({"success": True, "message": "Exercise session saved successfully"})
+        else:
+            return jsonify({"success": False, "message": "Failed to save exercise session"}), 500
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Save error: {str(e)}"}), 500
+
+@api.route("/save-exercise-sessions", methods=["POST"])
+def save_exercise_sessions():
+    """Save a batch of exercise sessions (offline sync) in one transaction.
+
+    Items carrying a client_session_id that is already stored for the same user are
+    reported as duplicates instead of being inserted again, so retries are safe.
+    """
+    try:
+        try:
+            items = parse_bulk_sessions()
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if not items:
+            return jsonify({"success": False, "message": "No sessions provided"}), 400
+        if len(items) > BULK_SESSION_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "message": f"At most {BULK_SESSION_MAX_ITEMS} sessions per request"
+            }), 413
+
+        results = []
+        sessions = []
+        for index, (item, error) in enumerate(items):
+            client_session_id = item.get('client_session_id') if isinstance(item, dict) else None
+            result = {"index": index, "client_session_id": client_session_id}
+            if error is None:
+                try:
+                    sessions.append((result, validate_bulk_session(item)))
+                except (TypeError, ValueError) as e:
+                    error = str(e)
+            if error is not None:
+                result.update({"status": "invalid", "message": error})
+            results.append(result)
+
+        if sessions:
+            outcomes = db.insert_exercise_sessions_bulk([session for _, session in sessions])
+            if outcomes is None:
+                return jsonify({"success": False, "message": "Failed to save exercise sessions"}), 500
+            for (result, _), (status, session_id) in zip(sessions, outcomes):
+                if status == 'unknown_user':
+                    result.update({"status": "invalid", "message": "User not found"})
+                else:
+                    result.update({"status": status, "session_id": session_id})
+
+        counts = {status: sum(1 for result in results if result['status'] == status)
+                  for status in ('inserted', 'duplicate', 'invalid')}
+        return jsonify({"success": True, **counts, "results": results})
+
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Save error: {str(e)}"}), 500
+
+@api.route("/dashboard-summary/<int:user_id>", methods=["GET"])
+def get_dashboard_summary(user_id):
+    """Dashboard totals, streak, weekly series and per-exercise comparison from the daily rollups.
+
+    Pass today=YYYY-MM-DD (the client's local date) so streaks and the weekly series
+    follow the user's calendar rather than the server's.
+    """
+    try:
+        try:
+            today = datetime.date.fromisoformat(request.args['today']) if request.args.get('today') else datetime.date.today()
+            days = min(max(int(request.args.get('days', 7)), 1), 366)
+        except ValueError as e:
+            return jsonify({"success": False, "message": f"Invalid dashboard query: {e}"}), 400
+
+        dashboard = build_dashboard_summary(user_id, today, days)
+        if dashboard is not None:
+            return jsonify({"success": True, "dashboard": dashboard})
+        else:
+            return jsonify({"success": False, "message": "Failed to retrieve dashboard"}), 500
+
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Dashboard error: {str(e)}"}), 500
+
+@api.route("/get-user-history/<int:user_id>", methods=["GET"])
+def get_user_history(user_id):
+    """Get one page of a user's exercise history, newest first.
+
+    Query parameters mirror FilterOptions in types/ExerciseData.ts: start/end
+    (ISO dates), exercise_types (comma-separated), min_reps/max_reps and
+    has_real_activity. Pass the returned next_cursor as cursor to get the next page.
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_DEFAULT_LIMIT)), 1), HISTORY_MAX_LIMIT)
+            start = parse_client_datetime(request.args.get('start'))
+            end = parse_client_datetime(request.args.get('end'))
+            min_reps = request.args.get('min_reps', type=int)
+            max_reps = request.args.get('max_reps', type=int)
+            cursor = request.args.get('cursor')
+            after = decode_history_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "message": f"Invalid history query: {e}"}), 400
+
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        if start:
+            conditions.append("created_at >= ?")
+            params.append(start)
+        if end:
+            conditions.append("created_at <= ?")
+            params.append(end)
+        exercise_types = [name.strip() for name in request.args.get('exercise_types', '').split(',') if name.strip()]
+        if exercise_types:
+            conditions.append(f"exercise_type IN ({', '.join('?' * len(exercise_types))})")
+            params.extend(exercise_types)
+        if min_reps is not None:
+            conditions.append("sit_up_count >= ?")
+            params.append(min_reps)
+        if max_reps is not None:
+            conditions.append("sit_up_count <= ?")
+            params.append(max_reps)
+        if is_truthy(request.args.get('has_real_activity', '')):
+            # Sessions without real activity are stored with zero reps
+            conditions.append("sit_up_count > 0")
+        if after:
+            # Keyset pagination: continue strictly after the last row of the previous page.
+            # Compared at full DATETIME2 precision, so rows tied on created_at are not skipped
+            conditions.append("(created_at < CAST(? AS DATETIME2) OR (created_at = CAST(? AS DATETIME2) AND id < ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        # Served by IX_exercise_sessions_user_created (user_id, created_at DESC, id DESC)
+        history_query = f"""
+        SELECT TOP ({limit + 1}) id, exercise_type, sit_up_count, form_score, feedback, created_at,
+               CONVERT(VARCHAR(27), created_at, 121) AS cursor_created_at
+        FROM exercise_sessions 
+        WHERE {' AND '.join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        """
+        
+        history = db.execute_query(history_query, tuple(params))
+        
+        if history is not None:
+            has_more = len(history) > limit
+            history = history[:limit]
+            next_cursor = encode_history_cursor(history[-1]) if has_more else None
+            for row in history:
+                del row['cursor_created_at']
+            return jsonify({
+                "success": True,
+                "history": history,
+                "has_more": has_more,
+                "next_cursor": next_cursor
+            })
+        else:
+            return jsonify({"success": False, "message": "Failed to retrieve history"}), 500
+            
+    except Exception as e:
+        return jsonify({"success": False, "message": f"History error: {str(e)}"}), 500
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Offline batch analysis for SAP Sports Analysis Platform
+Analyses directories or globs of videos in parallel with the same code path as
+/upload-video and streams one JSON line per video, e.g. to backfill scores after
+an algorithm change. Re-running with the same --output resumes: the last line
+for each video decides, so a video whose last line is a result from the same
+profile, algorithm version and exercises is skipped, and one that failed or was
+analysed with other settings is analysed again.
+
+Usage: python batch_analyze.py VIDEO_DIR_OR_GLOB [...] --output results.jsonl
+                               [--max-workers 4] [--profile accurate] [--exercise sit-ups,push-ups]
+                               [--motion-gate | --motion-threshold 0.002] [--persist-track]
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.avi', '.mkv')
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# This worker's warm Pose instance, created once per process
+_worker_pose = None
+
+
+def find_videos(inputs):
+    """Expand files, directories (recursively) and glob patterns into a sorted list of video paths"""
+    videos = set()
+    for item in inputs:
+        paths = [item] if os.path.exists(item) else glob.glob(item, recursive=True)
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    videos.update(os.path.join(root, name) for name in files
+                                  if name.lower().endswith(VIDEO_EXTENSIONS))
+            elif os.path.isfile(path):
+                videos.add(path)
+    return sorted(os.path.abspath(path) for path in videos)
+
+
+def result_settings(record):
+    """(profile, algorithm version, exercise set) a result line was produced with"""
+    exercises = record.get('exercises')
+    if exercises is None and 'result' in record:
+        # Lines written before the exercise list was recorded
+        exercises = record['result'].get('exercises', {})
+    return record.get('profile'), record.get('algorithm_version'), frozenset(exercises or ())
+
+
+def completed_videos(output_path, settings):
+    """Videos whose last line in an existing output file is a success with these settings.
+
+    A line cut short by an interrupted run is dropped from the file so appending
+    continues on a clean line.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    # video -> settings of its last successful line, or None if its last line is an error
+    last = {}
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            last[record['video']] = None if 'error' in record else result_settings(record)
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return {video for video, video_settings in last.items() if video_settings == settings}
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _init_worker(profile_name):
+    """Load the pose model once per worker process"""
+    global _worker_pose
+    from analysis import create_pose, get_profile
+    _worker_pose = create_pose(get_profile(profile_name))
+
+
+def analyze_file(task):
+    """Analyse one video; runs in a worker process"""
+    from analysis import ALGORITHM_VERSION, StageTimings
+    from exercises import analyze_video
+
+    video_path, profile_name, exercise_types, motion_threshold, persist_track = task
+    record = {'video': video_path, 'profile': profile_name, 'algorithm_version': ALGORITHM_VERSION,
+              'exercises': list(exercise_types)}
+    started = time.perf_counter()
+    try:
+        record['content_hash'] = content_hash(video_path)
+        # Drop tracking state left over from the previous video
+        _worker_pose.reset()
+        timings = StageTimings()
+        result = analyze_video(video_path, exercise_types, profile_name, pose=_worker_pose,
+                               track_key=record['content_hash'] if persist_track else None,
+                               timings=timings, motion_threshold=motion_threshold)
+        if result['total_frames'] == 0:
+            raise ValueError("No frames could be decoded")
+        record['result'] = result
+        record['timing'] = {'seconds': round(time.perf_counter() - started, 4), 'stages': timings.to_dict()}
+    except Exception as e:
+        record['error'] = str(e)
+        record['timing'] = {'seconds': round(time.perf_counter() - started, 4)}
+    record['completed_at'] = datetime.datetime.now().isoformat()
+    return record
+
+
+def main():
+    from analysis import ALGORITHM_VERSION, DEFAULT_PROFILE, get_profile
+    from exercises import motion_threshold_for, parse_exercise_types
+
+    parser = argparse.ArgumentParser(description="Analyse many videos offline and write JSONL results")
+    parser.add_argument('inputs', nargs='+', help="Video files, directories or glob patterns")
+    parser.add_argument('--output', required=True, help="JSONL file to write; an existing one is resumed")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, help="Analysis profile")
+    parser.add_argument('--exercise', default=None, help="Comma-separated exercise types (default: sit-ups)")
+    parser.add_argument('--motion-gate', action='store_true',
+                        help="Skip pose inference on static frames, with the exercises' own thresholds")
+    parser.add_argument('--motion-threshold', type=float, default=None,
+                        help="Motion gate with this threshold instead (default: every frame is analysed)")
+    parser.add_argument('--persist-track', action='store_true',
+                        help="Store each video's landmark track for later re-scoring")
+    args = parser.parse_args()
+
+    try:
+        get_profile(args.profile)
+        exercise_types = parse_exercise_types(args.exercise)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print("📦 SAP Batch Video Analysis")
+    print("=" * 60)
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("❌ No videos found")
+        sys.exit(1)
+    done = completed_videos(args.output, (args.profile, ALGORITHM_VERSION, frozenset(exercise_types)))
+    pending = [path for path in videos if path not in done]
+    print(f"🎬 {len(videos)} videos found, {len(videos) - len(pending)} already in {args.output}, "
+          f"{len(pending)} to analyse")
+    if not pending:
+        return
+
+    motion_threshold = args.motion_threshold
+    if motion_threshold is None and args.motion_gate:
+        motion_threshold = motion_threshold_for(exercise_types)
+    tasks = [(path, args.profile, exercise_types, motion_threshold, args.persist_track) for path in pending]
+    workers = max(1, min(args.max_workers, len(tasks)))
+    failed = 0
+    started = time.perf_counter()
+    # spawn keeps each worker's MediaPipe/OpenCV threads to itself, as in the server's pose pool
+    context = multiprocessing.get_context('spawn')
+    with open(args.output, 'a') as output, \
+            context.Pool(workers, initializer=_init_worker, initargs=(args.profile,)) as pool:
+        for index, record in enumerate(pool.imap_unordered(analyze_file, tasks), 1):
+            # One flushed line per video, so an interrupted run loses at most the videos in flight
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            if 'error' in record:
+                failed += 1
+                print(f"❌ [{index}/{len(tasks)}] {record['video']}: {record['error']}")
+            else:
+                counts = ", ".join(f"{name}={exercise['reps']}"
+                                   for name, exercise in record['result']['exercises'].items())
+                print(f"  [{index}/{len(tasks)}] {record['video']}  {counts}  {record['timing']['seconds']:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    print("\n" + "=" * 60)
+    print(f"✅ Analysed {len(tasks) - failed} of {len(tasks)} videos in {elapsed:.1f}s with {workers} workers")
+    print(f"📝 Results written to {args.output}")
+    if failed:
+        print(f"⚠️  {failed} failed; run again with the same --output to retry them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Pose pipeline benchmark for SAP Sports Analysis Platform
+Generates deterministic synthetic sit-up videos, times analyze_sit_ups stage by
+stage (decode, resize, colour convert, pose, counting) and reports frames/s,
+per-frame p50/p95 latency and peak RSS, failing any case that errors or miscounts.
+Results can be saved as a baseline and later runs compared against it to catch
+regressions before deploy.
+
+Usage: python benchmark.py [--resolutions 640x360,1280x720] [--fps 30] [--durations 5]
+                           [--profiles accurate,balanced] [--repeat 3]
+                           [--save-baseline baseline.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import cv2  # pyright: ignore[reportMissingImports]
+import numpy as np  # pyright: ignore[reportMissingImports]
+
+VIDEO_DIR = os.path.join(tempfile.gettempdir(), 'sap-benchmark-videos')
+# Seconds per synthetic sit-up
+REP_PERIOD = 2.0
+# Bump when draw_frame changes, so videos cached in VIDEO_DIR are regenerated
+FIGURE_VERSION = 2
+# A case regresses when its fps drops, or its peak RSS grows, by more than this fraction
+DEFAULT_TOLERANCE = 0.15
+STAGES = ('decode', 'grab', 'resize', 'colour', 'pose', 'counting')
+
+
+def parse_resolution(value):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height)
+
+
+def _limb(image, start, end, thickness, color):
+    cv2.line(image, (int(start[0]), int(start[1])), (int(end[0]), int(end[1])), color, thickness, cv2.LINE_AA)
+
+
+def draw_frame(background, frame_index, fps):
+    """Render one frame of a figure doing sit-ups; depends only on the frame index.
+
+    The figure lies flat for a moment at the bottom of each rep (hip angle about
+    174 degrees) and curls past upright at the top (about 50), so every rep crosses
+    both SIT_UP_THRESHOLDS angles with room to spare.
+    """
+    image = background.copy()
+    height, width = image.shape[:2]
+    # Larger figures were often missed by the pose detector at 720p and above
+    unit = height / 12
+    skin, shirt, trousers = (140, 170, 215), (60, 90, 200), (70, 50, 40)
+    hair, dark, nose, lips = (40, 40, 60), (40, 30, 30), (110, 140, 190), (60, 60, 150)
+
+    # Torso angle from the floor: held at 0 around the start of each rep, 125 degrees mid-rep
+    phase = (frame_index / fps) % REP_PERIOD / REP_PERIOD
+    torso_angle = math.radians(125 * min(1.0, max(0.0, 0.5 - 0.75 * math.cos(2 * math.pi * phase))))
+    # Unit vectors from the hip towards the head, and out of the chest
+    up = np.array([-math.cos(torso_angle), -math.sin(torso_angle)])
+    front = np.array([math.sin(torso_angle), -math.cos(torso_angle)])
+    # Legs almost straight along the floor, knees raised 6 degrees
+    leg_angle = math.radians(6)
+
+    hip = np.array([width * 0.42, height * 0.82])
+    knee = hip + 2.4 * unit * np.array([math.cos(leg_angle), -math.sin(leg_angle)])
+    ankle = knee + 2.3 * unit * np.array([math.cos(leg_angle), math.sin(leg_angle)])
+    toe = ankle + [0.2 * unit, -0.6 * unit]
+    shoulder = hip + 3.0 * unit * up
+    head = hip + 4.1 * unit * up
+    # Arms reach along the body towards the knees
+    elbow = shoulder - 1.3 * unit * up + 0.3 * unit * front
+    wrist = elbow - 1.2 * unit * up + 0.2 * unit * front
+
+    thickness = max(2, int(unit * 0.6))
+    _limb(image, hip, knee, thickness, trousers)
+    _limb(image, knee, ankle, thickness, trousers)
+    _limb(image, ankle, toe, thickness // 2 + 1, dark)
+    _limb(image, hip, shoulder, int(thickness * 1.8), shirt)
+    _limb(image, shoulder, elbow, thickness // 2 + 2, shirt)
+    _limb(image, elbow, wrist, thickness // 2 + 2, skin)
+
+    # MediaPipe finds people by their face first, so the head gets one facing the camera
+    radius = unit * 0.75
+    center = (int(head[0]), int(head[1]))
+    cv2.circle(image, center, int(radius), skin, -1, cv2.LINE_AA)
+    cv2.ellipse(image, center, (int(radius), int(radius)), math.degrees(math.atan2(up[1], up[0])),
+                -70, 70, hair, -1, cv2.LINE_AA)
+    for side in (-1, 1):
+        eye = head + 0.15 * radius * up + side * 0.38 * radius * front
+        cv2.circle(image, (int(eye[0]), int(eye[1])), max(1, int(radius * 0.12)), dark, -1, cv2.LINE_AA)
+    feature = max(1, int(radius * 0.08))
+    _limb(image, head + 0.05 * radius * up, head - 0.2 * radius * up, feature, nose)
+    _limb(image, head - 0.45 * radius * up - 0.25 * radius * front,
+          head - 0.45 * radius * up + 0.25 * radius * front, feature, lips)
+    return image
+
+
+def expected_sit_ups(duration):
+    """Sit-ups in a synthetic video of this length: the reps whose top is inside it"""
+    return int(duration / REP_PERIOD + 0.5)
+
+
+def synthetic_video(width, height, fps, duration, video_dir=VIDEO_DIR):
+    """Write (or reuse) a deterministic synthetic sit-up video and return its path"""
+    os.makedirs(video_dir, exist_ok=True)
+    path = os.path.join(video_dir, f"situps-v{FIGURE_VERSION}_{width}x{height}_{fps}fps_{duration}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    # Fixed-seed textured background so the encoder has realistic work to do
+    rng = np.random.default_rng(1234)
+    noise = rng.integers(0, 40, size=(height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    background = cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR) + np.uint8(90)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV could not open an mp4v video writer")
+    try:
+        for frame_index in range(int(round(fps * duration))):
+            writer.write(draw_frame(background, frame_index, fps))
+    finally:
+        writer.release()
+    os.replace(tmp_path, path)
+    return path
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_case(video_path, profile_name, repeat):
+    """Benchmark one video/profile in this (fresh) process and return its measurements"""
+    from analysis import StageTimings, analyze_sit_ups, create_pose, get_profile
+
+    profile = get_profile(profile_name)
+    started = time.perf_counter()
+    pose = create_pose(profile)
+    model_load = time.perf_counter() - started
+
+    runs = []
+    try:
+        # One untimed warm-up so lazy initialisation inside MediaPipe is not measured
+        analyze_sit_ups(video_path, profile_name, pose=pose)
+        for _ in range(repeat):
+            pose.reset()
+            timings = StageTimings(keep_samples=True)
+            started = time.perf_counter()
+            result = analyze_sit_ups(video_path, profile_name, pose=pose, timings=timings)
+            runs.append((time.perf_counter() - started, result, timings))
+    finally:
+        pose.close()
+
+    # Report the median run so one noisy repeat does not skew the numbers
+    elapsed, result, timings = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    pose_samples = timings.samples.get('pose', [])
+    return {
+        'seconds': round(elapsed, 4),
+        'model_load_seconds': round(model_load, 4),
+        'frames_read': result['total_frames'],
+        'frames_analyzed': result['frames_analyzed'],
+        'fps': round(result['total_frames'] / elapsed, 2) if elapsed else 0.0,
+        'analyzed_fps': round(result['frames_analyzed'] / elapsed, 2) if elapsed else 0.0,
+        'frame_latency_ms': {
+            'p50': round(percentile(pose_samples, 50) * 1000, 3),
+            'p95': round(percentile(pose_samples, 95) * 1000, 3),
+        },
+        'stages': {
+            stage: {
+                'seconds': round(timings.seconds[stage], 4),
+                'ms_per_frame': round(timings.seconds[stage] / timings.counts[stage] * 1000, 3),
+                'p95_ms': round(percentile(timings.samples[stage], 95) * 1000, 3),
+            }
+            for stage in STAGES if stage in timings.seconds
+        },
+        'sit_up_count': result['sit_up_count'],
+        'repeats': [round(run[0], 4) for run in runs],
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+    }
+
+
+def _case_worker(args):
+    try:
+        return run_case(*args)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def run_isolated(video_path, profile_name, repeat):
+    """Run a case in a fresh spawned process so peak RSS and model load are per case"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_case_worker, ((video_path, profile_name, repeat),))
+
+
+def compare(report, baseline, tolerance):
+    """Return regressions of report against a baseline, as human-readable strings.
+
+    A baseline case that is missing from the report, or failed in it, is a regression too.
+    """
+    regressions = []
+    for name, reference in baseline.get('cases', {}).items():
+        if name not in report['cases'] and 'error' not in reference:
+            regressions.append(f"{name}: in the baseline but not run")
+    for name, case in report['cases'].items():
+        reference = baseline.get('cases', {}).get(name)
+        if 'error' in case:
+            if reference and 'error' not in reference:
+                regressions.append(f"{name}: failed ({case['error']}), baseline ran")
+            continue
+        if not reference or 'error' in reference:
+            continue
+        if reference['fps'] and case['fps'] < reference['fps'] * (1 - tolerance):
+            regressions.append(f"{name}: {case['fps']:.1f} fps vs baseline {reference['fps']:.1f}")
+        if reference['peak_rss_mb'] and case['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {case['peak_rss_mb']} MB vs baseline {reference['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pose analysis pipeline on synthetic videos")
+    parser.add_argument('--resolutions', default='640x360,1280x720', help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument('--fps', default='30', help="Comma-separated frame rates")
+    parser.add_argument('--durations', default='5', help="Comma-separated durations in seconds")
+    parser.add_argument('--profiles', default='accurate,balanced,fast', help="Comma-separated analysis profiles")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case (median is reported)")
+    parser.add_argument('--video-dir', default=VIDEO_DIR, help="Where synthetic videos are generated and reused")
+    parser.add_argument('--json', help="Write the full report to this JSON file")
+    parser.add_argument('--save-baseline', help="Write the report as a baseline JSON file")
+    parser.add_argument('--baseline', help="Compare against this baseline and exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed fractional fps drop / RSS growth before a case counts as a regression")
+    args = parser.parse_args()
+
+    print("⏱️  SAP Pose Pipeline Benchmark")
+    print("=" * 60)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count(), 'opencv': cv2.__version__},
+        'cases': {},
+    }
+    # A case that crashed or counted its synthetic video wrong means the pipeline is
+    # broken, however fast the other cases ran
+    failures = []
+    for resolution in args.resolutions.split(','):
+        width, height = parse_resolution(resolution)
+        for fps in (int(value) for value in args.fps.split(',')):
+            for duration in (float(value) for value in args.durations.split(',')):
+                print(f"\n🎬 Generating {width}x{height} @ {fps} fps, {duration:g}s")
+                video_path = synthetic_video(width, height, fps, duration, args.video_dir)
+                expected = expected_sit_ups(duration)
+                for profile_name in args.profiles.split(','):
+                    name = f"{width}x{height}@{fps}/{duration:g}s/{profile_name}"
+                    case = run_isolated(video_path, profile_name, args.repeat)
+                    report['cases'][name] = case
+                    if 'error' in case:
+                        failures.append(f"{name}: {case['error']}")
+                        print(f"  ❌ {profile_name:<9} {case['error']}")
+                        continue
+                    stages = " ".join(f"{stage}={info['ms_per_frame']:.2f}ms" for stage, info in case['stages'].items())
+                    print(f"  {profile_name:<9} {case['fps']:>7.1f} fps  p50={case['frame_latency_ms']['p50']:.1f}ms "
+                          f"p95={case['frame_latency_ms']['p95']:.1f}ms  rss={case['peak_rss_mb']}MB  {stages}")
+                    case['expected_sit_ups'] = expected
+                    if case['sit_up_count'] != expected:
+                        failures.append(f"{name}: counted {case['sit_up_count']} sit-ups, expected {expected}")
+                        print(f"  ❌ {profile_name:<9} {failures[-1]}")
+
+    errored = any('error' in case for case in report['cases'].values())
+    for path in (args.json, args.save_baseline):
+        if not path:
+            continue
+        if path == args.save_baseline and errored:
+            print(f"\n❌ Not saving {path} as a baseline: some cases failed to run")
+            continue
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {path}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print("\n" + "=" * 60)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+        else:
+            print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    if failures:
+        print(f"\n❌ {len(failures)} case(s) failed:")
+        for failure in failures:
+            print(f"  - {failure}")
+    if regressions or failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
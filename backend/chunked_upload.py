@@ -0,0 +1,371 @@
+import os
+import json
+import uuid
+import time
+import select
+import struct
+import hashlib
+import datetime
+import threading
+from admission import Overloaded, streaming_gate
+from pose_pool import analyze_in_pool
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Partial uploads and their metadata live here until they are finalized or discarded
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BACKEND_DIR, 'chunked_uploads'))
+# Largest chunk accepted by a single append request
+MAX_CHUNK_BYTES = int(os.getenv('CHUNKED_UPLOAD_MAX_CHUNK_BYTES', str(16 * 1024 * 1024)))
+# Streaming analysis gives up on an upload that stops sending data for this long
+STREAM_IDLE_TIMEOUT = float(os.getenv('CHUNKED_UPLOAD_STREAM_IDLE_TIMEOUT', '120'))
+# Streaming analysis stops this many seconds after it started, freeing its pose worker;
+# an upload still arriving then is analysed in full at finalize
+STREAM_DEADLINE_SECONDS = float(os.getenv('CHUNKED_UPLOAD_STREAM_DEADLINE_SECONDS', '600'))
+# Bytes of the file inspected when deciding whether the container can be decoded while growing
+SNIFF_LIMIT_BYTES = 1024 * 1024
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start at the last confirmed offset"""
+
+    def __init__(self, current_offset):
+        super().__init__(f"Chunk must start at offset {current_offset}")
+        self.current_offset = current_offset
+
+
+def detect_streamable_container(header):
+    """Return 'webm' or 'fmp4' if the container can be decoded before the upload completes.
+
+    Returns None while undecided (header too short) and False for containers that
+    need the whole file, such as MP4 with the index at the end.
+    """
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+
+    # Walk top-level MP4 boxes: fragmented MP4 carries an 'mvex' box inside 'moov'
+    position = 0
+    while position + 8 <= len(header):
+        size, box_type = struct.unpack('>I4s', header[position:position + 8])
+        header_size = 8
+        if size == 1:
+            if position + 16 > len(header):
+                return None
+            size = struct.unpack('>Q', header[position + 8:position + 16])[0]
+            header_size = 16
+        if size < header_size:
+            return False
+        if box_type == b'moov':
+            if position + size > len(header):
+                return None
+            return 'fmp4' if b'mvex' in header[position + header_size:position + size] else False
+        if box_type in (b'mdat', b'moof'):
+            # Media data before the movie header: not decodable from the front
+            return False
+        if box_type not in (b'ftyp', b'free', b'skip', b'wide', b'uuid', b'styp', b'pdin'):
+            return False
+        position += size
+    return None
+
+
+class UploadSession:
+    """State of one chunked upload"""
+
+    def __init__(self, upload_id, data_path, meta_path, profile, exercise_types, total_size, created_at,
+                 persist_track=False):
+        self.upload_id = upload_id
+        self.data_path = data_path
+        self.meta_path = meta_path
+        self.profile = profile
+        self.exercise_types = exercise_types
+        self.persist_track = persist_track
+        self.total_size = total_size
+        self.created_at = created_at
+        self.container = None
+        self.finalized = False
+        self.aborted = False
+        self.streaming = None
+        # Set when streaming analysis could not start, e.g. without FIFO support
+        self.streaming_unavailable = False
+        self.condition = threading.Condition()
+        # Running hash of the bytes received so far; lost on restart and recomputed on finalize
+        self._digest = hashlib.sha256()
+        self._hashed_bytes = 0
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.data_path)
+        except OSError:
+            return 0
+
+    def to_dict(self):
+        return {
+            'upload_id': self.upload_id,
+            'offset': self.offset,
+            'total_size': self.total_size,
+            'profile': self.profile,
+            'exercise_types': self.exercise_types,
+            'container': self.container or None,
+            'streaming_analysis': self.streaming is not None and not self.streaming.stale,
+            'created_at': self.created_at,
+        }
+
+    def content_hash(self):
+        if self._hashed_bytes != self.offset:
+            digest = hashlib.sha256()
+            with open(self.data_path, 'rb') as f:
+                while True:
+                    chunk = f.read(COPY_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+            self._digest = digest
+            self._hashed_bytes = self.offset
+        return self._digest.hexdigest()
+
+
+class StreamingAnalysis:
+    """Analyse a growing upload through a FIFO while the rest of it is still arriving.
+
+    Holds a streaming_gate slot (taken by the caller) until the analysis ends.
+    """
+
+    def __init__(self, session, fifo_path, admission_token):
+        self.session = session
+        self.fifo_path = fifo_path
+        self.admission_token = admission_token
+        self.stale = False
+        self.result = None
+        self.error = None
+        self._fd = None
+        self._analysis_thread = None
+
+    def start(self):
+        if os.path.exists(self.fifo_path):
+            os.remove(self.fifo_path)
+        os.mkfifo(self.fifo_path)
+        # Holding the FIFO open read-write means the pose worker's open() never blocks
+        # waiting for a writer, however the feeder ends
+        self._fd = os.open(self.fifo_path, os.O_RDWR | os.O_NONBLOCK)
+        self._analysis_thread = threading.Thread(
+            target=self._analyze, name=f"upload-analysis-{self.session.upload_id}", daemon=True
+        )
+        self._analysis_thread.start()
+        threading.Thread(target=self._feed, name=f"upload-feed-{self.session.upload_id}", daemon=True).start()
+
+    def _analyze(self):
+        try:
+            # The content hash is not known yet, so a persisted track is keyed by the
+            # upload id until finalize re-keys it
+            track_key = self.session.upload_id if self.session.persist_track else None
+            self.result = analyze_in_pool(self.fifo_path, self.session.profile,
+                                          exercise_types=self.session.exercise_types, track_key=track_key,
+                                          deadline=time.time() + STREAM_DEADLINE_SECONDS)
+        except Exception as e:
+            self.error = e
+        finally:
+            streaming_gate.release(self.admission_token)
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        idle_since = time.monotonic()
+        while view:
+            if self.session.aborted or not self._analysis_thread.is_alive():
+                return False
+            _, writable, _ = select.select([], [self._fd], [], 1.0)
+            if not writable:
+                # The decoder is not draining the pipe
+                if time.monotonic() - idle_since > STREAM_IDLE_TIMEOUT:
+                    return False
+                continue
+            try:
+                written = os.write(self._fd, view)
+            except BlockingIOError:
+                continue
+            view = view[written:]
+            idle_since = time.monotonic()
+        return True
+
+    def _feed(self):
+        session = self.session
+        try:
+            with open(session.data_path, 'rb') as source:
+                position = 0
+                while True:
+                    with session.condition:
+                        while session.offset <= position and not session.finalized and not session.aborted:
+                            if not session.condition.wait(timeout=STREAM_IDLE_TIMEOUT):
+                                break
+                        idle = session.offset <= position and not session.finalized
+                    if session.aborted or idle:
+                        # Client went quiet or gave up; finalize falls back to full-file analysis
+                        self.stale = True
+                        break
+
+                    source.seek(position)
+                    chunk = source.read(COPY_CHUNK_BYTES)
+                    if chunk:
+                        if not self._write_all(chunk):
+                            self.stale = True
+                            break
+                        position += len(chunk)
+                    elif session.finalized:
+                        break
+        except OSError as e:
+            self.stale = True
+            self.error = self.error or e
+        finally:
+            # Unlink before closing so nothing can open the FIFO once the last writer is gone;
+            # closing then delivers EOF to the decoder
+            if os.path.exists(self.fifo_path):
+                os.remove(self.fifo_path)
+            os.close(self._fd)
+
+    def wait(self, timeout=None):
+        """Wait for the streaming result; returns None if it cannot be used"""
+        if self._analysis_thread:
+            self._analysis_thread.join(timeout)
+        if self.stale or self.error is not None or self.result is None:
+            return None
+        # Cut short by the deadline (slow upload) or otherwise incomplete: analyse the whole file
+        if self.result.get('total_frames', 0) == 0 or self.result.get('approximate'):
+            return None
+        return self.result
+
+
+class ChunkedUploads:
+    """Resumable chunked uploads stored on disk"""
+
+    def __init__(self, upload_dir=CHUNKED_UPLOAD_DIR):
+        self.upload_dir = upload_dir
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.upload_dir, upload_id)
+        return f"{base}.part", f"{base}.json"
+
+    def create(self, profile, exercise_types, total_size=None, persist_track=False):
+        """Start a new upload and return its session"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = self._paths(upload_id)
+        session = UploadSession(upload_id, data_path, meta_path, profile, exercise_types, total_size,
+                                datetime.datetime.now().isoformat(), persist_track)
+        open(data_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump({'profile': profile, 'exercise_types': exercise_types, 'total_size': total_size,
+                       'created_at': session.created_at, 'persist_track': persist_track}, f)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id):
+        """Return an upload session, reloading it from disk after a restart"""
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None:
+                return session
+
+            data_path, meta_path = self._paths(upload_id)
+            if not os.path.exists(meta_path) or not os.path.exists(data_path):
+                return None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            session = UploadSession(upload_id, data_path, meta_path, meta['profile'],
+                                    meta.get('exercise_types') or ['sit-ups'], meta.get('total_size'),
+                                    meta['created_at'], meta.get('persist_track', False))
+            self._sessions[upload_id] = session
+            return session
+
+    def append(self, session, offset, stream):
+        """Append a chunk read from stream at offset and return the new confirmed offset"""
+        with session.condition:
+            if session.finalized:
+                raise UploadOffsetError(session.offset)
+            current = session.offset
+            if offset != current:
+                raise UploadOffsetError(current)
+
+            with open(session.data_path, 'ab') as f:
+                received = 0
+                while True:
+                    chunk = stream.read(COPY_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    if received > MAX_CHUNK_BYTES:
+                        f.truncate(current)
+                        raise ValueError(f"Chunk exceeds {MAX_CHUNK_BYTES} bytes")
+                    f.write(chunk)
+                    if session._hashed_bytes == current + received - len(chunk):
+                        session._digest.update(chunk)
+                        session._hashed_bytes += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+            session.condition.notify_all()
+            self._maybe_start_streaming(session)
+            return current + received
+
+    def _maybe_start_streaming(self, session):
+        if session.container is False or session.streaming is not None or session.streaming_unavailable:
+            return
+        if session.container is None:
+            with open(session.data_path, 'rb') as f:
+                header = f.read(SNIFF_LIMIT_BYTES)
+            container = detect_streamable_container(header)
+            if container is None and len(header) < SNIFF_LIMIT_BYTES:
+                return
+            session.container = container or False
+            if not container:
+                return
+
+        # The feeder starts from the first byte, so with no free slot now streaming can
+        # still start on a later chunk; otherwise the upload is analysed at finalize
+        try:
+            token = streaming_gate.acquire()
+        except Overloaded:
+            return
+        fifo_path = os.path.join(self.upload_dir, f"{session.upload_id}.fifo")
+        session.streaming = StreamingAnalysis(session, fifo_path, token)
+        try:
+            session.streaming.start()
+        except Exception as e:
+            # The chunk is already stored, so failing here would strand the upload; it
+            # is analysed at finalize instead, and later chunks do not try again
+            session.streaming = None
+            session.streaming_unavailable = True
+            streaming_gate.release(token)
+            if os.path.exists(fifo_path):
+                os.remove(fifo_path)
+            print(f"⚠️  Streaming analysis unavailable for upload {session.upload_id}: {e}")
+            return
+        print(f"🎬 Started streaming analysis for upload {session.upload_id} ({session.container})")
+
+    def finalize(self, session):
+        """Mark an upload complete; returns its content hash"""
+        with session.condition:
+            session.finalized = True
+            session.condition.notify_all()
+        return session.content_hash()
+
+    def discard(self, session):
+        """Abort any streaming analysis and delete the upload's files.
+
+        The FIFO of a streaming analysis is removed by its feeder thread.
+        """
+        with session.condition:
+            session.aborted = True
+            session.condition.notify_all()
+        with self._lock:
+            self._sessions.pop(session.upload_id, None)
+        for path in self._paths(session.upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Global chunked upload store
+chunked_uploads = ChunkedUploads()
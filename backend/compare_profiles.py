@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Profile comparison report for SAP Sports Analysis Platform
+Runs every analysis profile over a set of videos and reports rep-count
+agreement and speed relative to the 'accurate' profile.
+
+Usage: python compare_profiles.py video1.mp4 [video2.mp4 ...] [--json report.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from analysis import ANALYSIS_PROFILES, analyze_sit_ups
+
+REFERENCE_PROFILE = 'accurate'
+
+
+def run_profiles(video_path):
+    """Analyze one video with every profile and time each run"""
+    runs = {}
+    for name in ANALYSIS_PROFILES:
+        started = time.perf_counter()
+        result = analyze_sit_ups(video_path, name)
+        runs[name] = {
+            'sit_up_count': result['sit_up_count'],
+            'frames_analyzed': result['frames_analyzed'],
+            'seconds': time.perf_counter() - started,
+        }
+    return runs
+
+
+def summarize(report):
+    """Aggregate agreement with the reference profile across all videos"""
+    summary = {}
+    for name in ANALYSIS_PROFILES:
+        exact = 0
+        abs_diffs = []
+        speedups = []
+        for runs in report.values():
+            reference = runs[REFERENCE_PROFILE]
+            diff = abs(runs[name]['sit_up_count'] - reference['sit_up_count'])
+            exact += diff == 0
+            abs_diffs.append(diff)
+            if runs[name]['seconds'] > 0:
+                speedups.append(reference['seconds'] / runs[name]['seconds'])
+        summary[name] = {
+            'exact_agreement': exact / len(report) if report else 0,
+            'mean_abs_rep_diff': sum(abs_diffs) / len(abs_diffs) if abs_diffs else 0,
+            'mean_speedup': sum(speedups) / len(speedups) if speedups else 0,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare analysis profiles on a set of videos")
+    parser.add_argument('videos', nargs='+', help="Video files to analyze")
+    parser.add_argument('--json', help="Also write the full report to this JSON file")
+    args = parser.parse_args()
+
+    print("📊 SAP Analysis Profile Comparison")
+    print("=" * 60)
+
+    report = {}
+    for video_path in args.videos:
+        print(f"\n🎬 {video_path}")
+        try:
+            report[video_path] = run_profiles(video_path)
+        except Exception as e:
+            print(f"❌ Analysis failed: {e}")
+            continue
+        for name, run in report[video_path].items():
+            print(f"  {name:<10} reps={run['sit_up_count']:<4} "
+                  f"frames={run['frames_analyzed']:<6} time={run['seconds']:.2f}s")
+
+    if not report:
+        print("\n❌ No videos could be analyzed")
+        sys.exit(1)
+
+    summary = summarize(report)
+    print("\n" + "=" * 60)
+    print(f"{'profile':<10} {'agreement':>10} {'mean |Δreps|':>14} {'speedup':>9}")
+    for name, stats in summary.items():
+        print(f"{name:<10} {stats['exact_agreement']:>9.0%} "
+              f"{stats['mean_abs_rep_diff']:>14.2f} {stats['mean_speedup']:>8.2f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'videos': report, 'summary': summary}, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,233 @@
 import pyodbc  # pyright: ignore[reportMissingImports]
 import os
+import time
+import threading
+from collections import deque
+from functools import wraps
+from contextlib import contextmanager
 from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
+from metrics import DB_ERRORS, DB_QUERY_SECONDS, Gauge, Histogram
 
 load_dotenv()
 
+# Connection pool sizing: connections opened up front, and the most ever open at once
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+# Seconds a request waits for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Connections idle longer than this are pinged with SELECT 1 before being handed out
+DB_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE_SECONDS', '30'))
+# Connections older than this are closed and replaced, so server-side timeouts never bite
+DB_POOL_RECYCLE_SECONDS = float(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+
+# SQL Server accepts at most 2100 parameters per statement; IN lists are chunked below that
+MAX_IN_PARAMETERS = 1000
+
+
+DB_POOL_WAIT_SECONDS = Histogram('sap_db_pool_wait_seconds', "Time spent waiting to check out a database connection",
+                                 buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10))
+
+
+def timed(operation):
+    """Record a DatabaseConnection method's latency, and a failure when it returns None/False"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = method(*args, **kwargs)
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=operation)
+            if result is None or result is False:
+                DB_ERRORS.inc(operation=operation)
+            return result
+        return wrapper
+    return decorator
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+
+class PooledConnection:
+    """A pyodbc connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def close(self):
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of pyodbc connections.
+
+    Connections are checked out for one unit of work and always returned rolled back,
+    so a failed statement on one request thread cannot leave a half-open transaction
+    for the next. Broken connections are discarded instead of being returned.
+    """
+
+    def __init__(self, connect, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE_SECONDS,
+                 recycle=DB_POOL_RECYCLE_SECONDS):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.recycle = recycle
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0, 'waits': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0,
+            'timeouts': 0, 'connections_opened': 0, 'connections_discarded': 0, 'health_check_failures': 0,
+        }
+
+    def _open(self):
+        connection = PooledConnection(self._connect())
+        with self._condition:
+            self._stats['connections_opened'] += 1
+        return connection
+
+    def fill(self):
+        """Open connections until min_size are available"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._open()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._idle.append(connection)
+                self._condition.notify()
+
+    def _healthy(self, connection):
+        now = time.monotonic()
+        if now - connection.created_at > self.recycle:
+            return False
+        if now - connection.last_used > self.healthcheck_idle:
+            try:
+                cursor = connection.raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            except Exception:
+                with self._condition:
+                    self._stats['health_check_failures'] += 1
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, opening one if the pool is below max_size"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            connection = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection free after {timeout:.1f}s (pool size {self.max_size})"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    # Most recently used first: warm connections stay warm and idle ones age out
+                    connection = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if connection is None:
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+            elif not self._healthy(connection):
+                self._discard(connection)
+                continue
+
+            wait_seconds = time.monotonic() - started
+            DB_POOL_WAIT_SECONDS.observe(wait_seconds)
+            with self._condition:
+                self._stats['checkouts'] += 1
+                if waited:
+                    self._stats['waits'] += 1
+                self._stats['wait_seconds_total'] += wait_seconds
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait_seconds)
+            return connection
+
+    def _discard(self, connection):
+        connection.close()
+        with self._condition:
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._condition.notify()
+
+    def release(self, connection):
+        """Return a connection; it is rolled back first and dropped if that fails"""
+        try:
+            connection.raw.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        connection.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of a with block"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection.raw
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones are closed when released"""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            connection.close()
+        return len(idle)
+
+    def stats(self):
+        """Return pool sizes and checkout/wait counters"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        stats['wait_seconds_avg'] = round(stats['wait_seconds_total'] / stats['checkouts'], 6) if stats['checkouts'] else 0.0
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 6)
+        stats['wait_seconds_max'] = round(stats['wait_seconds_max'], 6)
+        return stats
+
+
 class DatabaseConnection:
     def __init__(self):
         # SQL Server connection string
@@ -16,12 +240,12 @@ class DatabaseConnection:
             "Encrypt=yes;"
             "TrustServerCertificate=yes;"
         )
-        self.connection = None
+        self.pool = ConnectionPool(lambda: pyodbc.connect(self.connection_string))
 
     def connect(self):
-        """Establish database connection"""
+        """Establish the pool's minimum set of database connections"""
         try:
-            self.connection = pyodbc.connect(self.connection_string)
+            self.pool.fill()
             print("✅ Database connection established successfully")
             return True
         except Exception as e:
@@ -29,57 +253,287 @@ class DatabaseConnection:
             return False
 
     def disconnect(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
+        """Close pooled database connections"""
+        if self.pool.close_all():
             print("Database connection closed")
 
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor whose statements commit together, or roll back on error"""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+                connection.commit()
+            finally:
+                cursor.close()
+
+    @timed('query')
     def execute_query(self, query, params=None):
         """Execute a SELECT query and return results"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return None
-            
-            cursor = self.connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            columns = [column[0] for column in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            
-            cursor.close()
-            return results
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                columns = [column[0] for column in cursor.description]
+                results = []
+                for row in cursor.fetchall():
+                    results.append(dict(zip(columns, row)))
+
+                cursor.close()
+                return results
         except Exception as e:
             print(f"❌ Query execution failed: {e}")
             return None
 
+    @timed('update')
     def execute_update(self, query, params=None):
         """Execute an INSERT, UPDATE, or DELETE query"""
         try:
-            if not self.connection:
-                if not self.connect():
-                    return False
-            
-            cursor = self.connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            self.connection.commit()
-            cursor.close()
+            with self.transaction() as cursor:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
             return True
         except Exception as e:
             print(f"❌ Update execution failed: {e}")
-            if self.connection:
-                self.connection.rollback()
             return False
 
+    @timed('insert_session')
+    def insert_exercise_session(self, user_id, exercise_type, video_path, sit_up_count, form_score, feedback):
+        """Insert one exercise session row and fold it into the daily rollups"""
+        save_query = """
+        INSERT INTO exercise_sessions (user_id, exercise_type, video_path, sit_up_count, form_score, feedback) 
+        OUTPUT INSERTED.created_at
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(save_query, (user_id, exercise_type, video_path, sit_up_count, form_score, feedback))
+                created_at = cursor.fetchone()[0]
+                self._merge_daily_rollups(cursor, [(user_id, created_at, exercise_type, sit_up_count, form_score)])
+            return True
+        except Exception as e:
+            print(f"❌ Update execution failed: {e}")
+            return False
+
+    def _merge_daily_rollups(self, cursor, sessions):
+        """Add (user_id, created_at, exercise_type, reps, form_score) sessions to exercise_daily_rollups.
+
+        Runs on the caller's cursor so the rollup changes commit with the session rows.
+        created_at is the value stored in exercise_sessions, so the day matches what
+        rebuild_daily_rollups derives from the database's clock.
+        A session counts as active, like hasRealActivity in the app, when it has reps.
+        """
+        merge_query = """
+        MERGE exercise_daily_rollups WITH (HOLDLOCK) AS target
+        USING (SELECT ? AS user_id, ? AS activity_date, ? AS exercise_type, ? AS session_count,
+                      ? AS active_session_count, ? AS total_reps, ? AS active_form_score_sum) AS source
+        ON target.user_id = source.user_id AND target.activity_date = source.activity_date
+           AND target.exercise_type = source.exercise_type
+        WHEN MATCHED THEN UPDATE SET
+            session_count = target.session_count + source.session_count,
+            active_session_count = target.active_session_count + source.active_session_count,
+            total_reps = target.total_reps + source.total_reps,
+            active_form_score_sum = target.active_form_score_sum + source.active_form_score_sum,
+            updated_at = GETDATE()
+        WHEN NOT MATCHED THEN INSERT
+            (user_id, activity_date, exercise_type, session_count, active_session_count, total_reps, active_form_score_sum)
+        VALUES (source.user_id, source.activity_date, source.exercise_type, source.session_count,
+                source.active_session_count, source.total_reps, source.active_form_score_sum);
+        """
+        # Pre-aggregate so each (user, day, exercise) is merged once per transaction
+        deltas = {}
+        for user_id, created_at, exercise_type, reps, form_score in sessions:
+            reps, form_score = int(reps or 0), int(form_score or 0)
+            key = (int(user_id), created_at.date(), exercise_type)
+            delta = deltas.setdefault(key, [0, 0, 0, 0])
+            delta[0] += 1
+            delta[2] += reps
+            if reps > 0:
+                delta[1] += 1
+                delta[3] += form_score
+        self._executemany(cursor, merge_query, [key + tuple(delta) for key, delta in deltas.items()])
+
+    @timed('rebuild_rollups')
+    def rebuild_daily_rollups(self, user_id=None):
+        """Recompute rollups from exercise_sessions, e.g. after sessions were re-scored"""
+        scope = "WHERE user_id = ?" if user_id is not None else ""
+        params = (user_id,) if user_id is not None else ()
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(f"DELETE FROM exercise_daily_rollups {scope}", params)
+                cursor.execute(f"""
+                INSERT INTO exercise_daily_rollups
+                    (user_id, activity_date, exercise_type, session_count, active_session_count, total_reps, active_form_score_sum)
+                SELECT user_id, CAST(created_at AS DATE), exercise_type, COUNT(*),
+                       SUM(CASE WHEN sit_up_count > 0 THEN 1 ELSE 0 END),
+                       SUM(COALESCE(sit_up_count, 0)),
+                       SUM(CASE WHEN sit_up_count > 0 THEN COALESCE(form_score, 0) ELSE 0 END)
+                FROM exercise_sessions {scope}
+                GROUP BY user_id, CAST(created_at AS DATE), exercise_type
+                """, params)
+            return True
+        except Exception as e:
+            print(f"❌ Rollup rebuild failed: {e}")
+            return False
+
+    @timed('update')
+    def execute_update_rowcount(self, query, params=None):
+        """Execute an INSERT, UPDATE, or DELETE query and return the affected row count (None on failure)"""
+        try:
+            with self.transaction() as cursor:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return cursor.rowcount
+        except Exception as e:
+            print(f"❌ Update execution failed: {e}")
+            return None
+
+    @timed('bulk')
+    def execute_many(self, query, params_seq):
+        """Execute one INSERT/UPDATE for many parameter rows in a single transaction"""
+        try:
+            with self.transaction() as cursor:
+                self._executemany(cursor, query, params_seq)
+            return True
+        except Exception as e:
+            print(f"❌ Bulk execution failed: {e}")
+            return False
+
+    def _executemany(self, cursor, query, params_seq):
+        params_seq = list(params_seq)
+        if not params_seq:
+            return
+        # Send the whole parameter array in one round trip instead of one per row
+        cursor.fast_executemany = True
+        cursor.executemany(query, params_seq)
+
+    def _session_ids_for_clients(self, cursor, client_keys):
+        """Map (user_id, client_session_id) -> exercise_sessions.id for keys already stored"""
+        client_ids_by_user = {}
+        for user_id, client_session_id in client_keys:
+            client_ids_by_user.setdefault(user_id, []).append(client_session_id)
+
+        found = {}
+        # One parameter of each statement goes to the user id
+        chunk_size = MAX_IN_PARAMETERS - 1
+        for user_id, client_session_ids in client_ids_by_user.items():
+            for start in range(0, len(client_session_ids), chunk_size):
+                chunk = client_session_ids[start:start + chunk_size]
+                placeholders = ', '.join('?' * len(chunk))
+                # UPDLOCK/HOLDLOCK keeps a concurrent retry of the same batch from inserting
+                # these ids between this check and our insert
+                cursor.execute(
+                    f"SELECT id, client_session_id FROM exercise_sessions WITH (UPDLOCK, HOLDLOCK) "
+                    f"WHERE user_id = ? AND client_session_id IN ({placeholders})",
+                    [user_id] + chunk
+                )
+                found.update({(user_id, row[1]): row[0] for row in cursor.fetchall()})
+        return found
+
+    def _existing_user_ids(self, cursor, user_ids):
+        """The subset of user_ids that have a users row"""
+        found = set()
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), MAX_IN_PARAMETERS):
+            chunk = user_ids[start:start + MAX_IN_PARAMETERS]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f"SELECT id FROM users WHERE id IN ({placeholders})", chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    def _insert_session_rows(self, cursor, rows):
+        """Insert exercise_sessions rows and return their (id, created_at) as stored, in row order.
+
+        A MERGE that never matches inserts like INSERT but, unlike INSERT, lets OUTPUT
+        name the source row, so every id maps back to its row even without a client id.
+        """
+        columns = ('user_id', 'exercise_type', 'video_path', 'sit_up_count', 'form_score', 'feedback',
+                   'client_session_id', 'created_at')
+        rows_per_statement = MAX_IN_PARAMETERS // (len(columns) + 1)
+        stored = [None] * len(rows)
+        for start in range(0, len(rows), rows_per_statement):
+            chunk = rows[start:start + rows_per_statement]
+            values = ', '.join(['(?, ?, ?, ?, ?, ?, ?, ?, ?)'] * len(chunk))
+            cursor.execute(f"""
+            MERGE exercise_sessions AS target
+            USING (VALUES {values}) AS source (row_index, {', '.join(columns)})
+            ON 1 = 0
+            WHEN NOT MATCHED THEN INSERT ({', '.join(columns)})
+            VALUES (source.user_id, source.exercise_type, source.video_path, source.sit_up_count,
+                    source.form_score, source.feedback, source.client_session_id,
+                    COALESCE(source.created_at, GETDATE()))
+            OUTPUT source.row_index, INSERTED.id, INSERTED.created_at;
+            """, [value for index, row in enumerate(chunk, start) for value in (index,) + tuple(row)])
+            for index, session_id, created_at in cursor.fetchall():
+                stored[index] = (session_id, created_at)
+        return stored
+
+    @timed('insert_sessions_bulk')
+    def insert_exercise_sessions_bulk(self, sessions):
+        """Insert many exercise sessions in one transaction, skipping client ids the user already stored.
+
+        Returns a (status, session_id) pair per input session, with status 'inserted',
+        'duplicate' or 'unknown_user' (no such user_id, nothing stored), or None if the
+        transaction failed.
+        """
+        client_keys = list(dict.fromkeys(
+            (session['user_id'], session['client_session_id'])
+            for session in sessions if session.get('client_session_id')
+        ))
+        try:
+            with self.transaction() as cursor:
+                # Checked up front so one bad user_id does not fail the whole batch on the foreign key
+                users = self._existing_user_ids(cursor, {session['user_id'] for session in sessions})
+                existing = self._session_ids_for_clients(cursor, client_keys)
+                seen = set(existing)
+                outcomes = []
+                rows = []
+                for session in sessions:
+                    client_session_id = session.get('client_session_id')
+                    client_key = (session['user_id'], client_session_id)
+                    if session['user_id'] not in users:
+                        outcomes.append(('unknown_user', None))
+                        continue
+                    if client_session_id and client_key in seen:
+                        outcomes.append(('duplicate', client_key))
+                        continue
+                    if client_session_id:
+                        seen.add(client_key)
+                    outcomes.append(('inserted', len(rows)))
+                    rows.append((
+                        session['user_id'], session['exercise_type'], session['video_path'],
+                        session['sit_up_count'], session['form_score'], session['feedback'],
+                        client_session_id, session.get('created_at')
+                    ))
+                stored = self._insert_session_rows(cursor, rows)
+                # Rows without created_at took the database's GETDATE(); roll them up on that day
+                self._merge_daily_rollups(cursor, [
+                    (row[0], created_at, row[1], row[3], row[4]) for row, (_, created_at) in zip(rows, stored)
+                ])
+        except Exception as e:
+            print(f"❌ Bulk session insert failed: {e}")
+            return None
+
+        # A client id repeated within the batch is a duplicate of the row just inserted for it
+        inserted = {(row[0], row[6]): session_id for row, (session_id, _) in zip(rows, stored) if row[6]}
+        results = []
+        for status, value in outcomes:
+            if status == 'inserted':
+                value = stored[value][0]
+            elif status == 'duplicate':
+                value = existing.get(value, inserted.get(value))
+            results.append((status, value))
+        return results
+
     def create_users_table(self):
         """Create users table if it doesn't exist"""
         create_table_query = """
@@ -134,12 +588,75 @@ class DatabaseConnection:
             sit_up_count INT DEFAULT 0,
             form_score INT DEFAULT 0,
             feedback NVARCHAR(1000),
+            client_session_id NVARCHAR(64) NULL,
             created_at DATETIME2 DEFAULT GETDATE(),
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
         """
         return self.execute_update(create_table_query)
 
+    def create_daily_rollups_table(self):
+        """Create the per-user, per-day, per-exercise rollup table and backfill it once"""
+        create_table_query = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='exercise_daily_rollups' AND xtype='U')
+        CREATE TABLE exercise_daily_rollups (
+            user_id INT NOT NULL,
+            activity_date DATE NOT NULL,
+            exercise_type NVARCHAR(50) NOT NULL,
+            session_count INT NOT NULL DEFAULT 0,
+            active_session_count INT NOT NULL DEFAULT 0,
+            total_reps INT NOT NULL DEFAULT 0,
+            active_form_score_sum INT NOT NULL DEFAULT 0,
+            updated_at DATETIME2 DEFAULT GETDATE(),
+            PRIMARY KEY (user_id, activity_date, exercise_type),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        """
+        if not self.execute_update(create_table_query):
+            return False
+        existing = self.execute_query("SELECT TOP 1 user_id FROM exercise_daily_rollups")
+        if existing is None:
+            return False
+        return bool(existing) or self.rebuild_daily_rollups()
+
+    def migrate_exercise_sessions_table(self):
+        """Add exercise_sessions columns and indexes introduced after the table was created"""
+        migrations = [
+            """
+            IF COL_LENGTH('exercise_sessions', 'client_session_id') IS NULL
+            ALTER TABLE exercise_sessions ADD client_session_id NVARCHAR(64) NULL
+            """,
+            # Client ids are only unique per user; replaces the first, table-wide index
+            """
+            IF EXISTS (SELECT * FROM sys.indexes WHERE name='UX_exercise_sessions_client_session_id')
+            DROP INDEX UX_exercise_sessions_client_session_id ON exercise_sessions
+            """,
+            # Filtered so sessions saved without a client id do not collide on NULL
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='UX_exercise_sessions_user_client_session_id')
+            CREATE UNIQUE INDEX UX_exercise_sessions_user_client_session_id
+            ON exercise_sessions (user_id, client_session_id) WHERE client_session_id IS NOT NULL
+            """,
+        ]
+        return all(self.execute_update(query) for query in migrations)
+
+    def create_indexes(self):
+        """Create the indexes behind history pagination and session expiry lookups"""
+        indexes = [
+            # Keyset-paginated history: seek to the user, then walk newest first
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_exercise_sessions_user_created')
+            CREATE INDEX IX_exercise_sessions_user_created
+            ON exercise_sessions (user_id, created_at DESC, id DESC)
+            INCLUDE (exercise_type, sit_up_count, form_score)
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_user_sessions_expires_at')
+            CREATE INDEX IX_user_sessions_expires_at ON user_sessions (expires_at)
+            """,
+        ]
+        return all(self.execute_update(query) for query in indexes)
+
     def initialize_database(self):
         """Initialize database with required tables"""
         print("🔧 Initializing database tables...")
@@ -151,7 +668,10 @@ class DatabaseConnection:
         tables_created = (
             self.create_users_table() and
             self.create_sessions_table() and
-            self.create_exercise_sessions_table()
+            self.create_exercise_sessions_table() and
+            self.migrate_exercise_sessions_table() and
+            self.create_indexes() and
+            self.create_daily_rollups_table()
         )
         
         if tables_created:
@@ -164,3 +684,8 @@ class DatabaseConnection:
 
 # Global database instance
 db = DatabaseConnection()
+
+Gauge('sap_db_pool_connections_in_use', "Database connections currently checked out",
+      function=lambda: db.pool.stats()['in_use'])
+Gauge('sap_db_pool_connections_open', "Database connections open in the pool",
+      function=lambda: db.pool.stats()['size'])
@@ -0,0 +1,294 @@
+import contextlib
+import numpy as np  # pyright: ignore[reportMissingImports]
+from analysis import (
+    DEFAULT_PROFILE, AnalysisBudget, MotionGate, create_pose, extract_landmarks, get_profile, joint_angles,
+    count_hysteresis_reps, mp_pose, score_sit_ups, measure_stage
+)
+from landmark_store import save_track
+
+# Exercise name -> analyzer(track, thresholds) returning a result dict with at least
+# 'reps', 'form_score', 'feedback' and 'summary'
+EXERCISE_ANALYZERS = {}
+
+DEFAULT_EXERCISE = 'sit-ups'
+
+# Exercise-specific thresholds; analyzers accept overrides for re-scoring
+EXERCISE_THRESHOLDS = {
+    'push-ups': {
+        'bottom_angle': 90,  # Elbow angle below which the athlete is at the bottom
+        'top_angle': 160,  # Elbow angle above which the arms are locked out
+        'min_body_angle': 150,  # Shoulder-hip-ankle angle below which the hips sag or pike
+    },
+    'plank hold': {
+        'min_body_angle': 160,  # Shoulder-hip-ankle angle that still counts as a straight body
+        'max_incline': 0.35,  # Vertical/horizontal shoulder-ankle ratio that still counts as lying
+    },
+    'vertical jump': {
+        'takeoff_rise': 0.08,  # Hip rise, relative to body length, that counts as airborne
+        'landing_rise': 0.02,  # Hip rise below which the athlete has landed
+    },
+}
+
+# Motion gate threshold per exercise, used when a request opts in to the gate: the
+# fraction of thumbnail pixels that must change before a frame goes to the pose model
+# again. Holds can skip more; a jump's take-off is short, so it gates least. The gate
+# is off by default so results match analyze_sit_ups and the benchmarks. See MotionGate.
+EXERCISE_MOTION_THRESHOLDS = {
+    'sit-ups': 0.002,
+    'push-ups': 0.002,
+    'plank hold': 0.004,
+    'vertical jump': 0.001,
+}
+
+GRAVITY = 9.81
+
+
+def register_analyzer(name):
+    """Decorator registering an analyzer for an exercise type"""
+    def decorator(func):
+        EXERCISE_ANALYZERS[name] = func
+        return func
+    return decorator
+
+
+def parse_exercise_types(value=None):
+    """Turn a comma-separated exercise_type value into a validated list"""
+    if isinstance(value, (list, tuple)):
+        names = [str(name).strip().lower() for name in value]
+    else:
+        names = [name.strip().lower() for name in (value or DEFAULT_EXERCISE).split(',')]
+    names = [name for name in dict.fromkeys(names) if name]
+    unknown = [name for name in names if name not in EXERCISE_ANALYZERS]
+    if unknown or not names:
+        raise ValueError(
+            f"Unknown exercise type '{', '.join(unknown)}'. Choose from: {', '.join(EXERCISE_ANALYZERS)}"
+        )
+    return names
+
+
+def _landmark(name, side):
+    return getattr(mp_pose.PoseLandmark, f"{side}_{name}").value
+
+
+def _best_side(track, names):
+    """Pick the body side whose joints are most visible over the whole track"""
+    best_side, best_visibility = 'LEFT', -1.0
+    for side in ('LEFT', 'RIGHT'):
+        indices = [_landmark(name, side) for name in names]
+        visibility = track.landmarks[:, indices, 3]
+        score = float(np.nanmean(visibility)) if np.any(~np.isnan(visibility)) else 0.0
+        if score > best_visibility:
+            best_side, best_visibility = side, score
+    return best_side
+
+
+def _points(track, name, side):
+    return track.landmarks[:, _landmark(name, side), :2].astype(np.float64)
+
+
+def _angles(a, b, c):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return joint_angles(a, b, c)
+
+
+def _timestamps(track):
+    if track.fps:
+        return track.frame_indices / track.fps
+    return None
+
+
+@register_analyzer('sit-ups')
+def analyze_sit_up_track(track, thresholds=None):
+    result = score_sit_ups(track, thresholds)
+    result['reps'] = result['sit_up_count']
+    result['summary'] = f"You performed {result['sit_up_count']} sit-ups with a form score of {result['form_score']}%."
+    return result
+
+
+@register_analyzer('push-ups')
+def analyze_push_up_track(track, thresholds=None):
+    thresholds = {**EXERCISE_THRESHOLDS['push-ups'], **(thresholds or {})}
+    side = _best_side(track, ('SHOULDER', 'ELBOW', 'WRIST', 'HIP', 'ANKLE'))
+    shoulder, hip = _points(track, 'SHOULDER', side), _points(track, 'HIP', side)
+    elbow_angles = _angles(shoulder, _points(track, 'ELBOW', side), _points(track, 'WRIST', side))
+    body_angles = _angles(shoulder, hip, _points(track, 'ANKLE', side))
+
+    # A rep is bottom (elbows bent) followed by lock-out; negate so the shared
+    # hysteresis counter sees bottom as the 'enter' state
+    reps, _, _ = count_hysteresis_reps(-elbow_angles, -thresholds['bottom_angle'], -thresholds['top_angle'])
+
+    detected = ~np.isnan(body_angles)
+    straight = body_angles[detected] >= thresholds['min_body_angle']
+    # Share of frames with a straight body line; no reps means nothing to score
+    form_score = int(round(100 * straight.mean())) if reps and len(straight) else 0
+
+    feedback = []
+    if reps and form_score < 80:
+        feedback.append("Keep your hips in line with your shoulders and ankles")
+    if reps == 0 and np.any(elbow_angles[~np.isnan(elbow_angles)] < thresholds['top_angle']):
+        feedback.append("Lower your chest until your elbows reach 90 degrees")
+
+    return {
+        'reps': reps,
+        'form_score': form_score,
+        'feedback': feedback,
+        'summary': f"You performed {reps} push-ups with a form score of {form_score}%.",
+    }
+
+
+@register_analyzer('plank hold')
+def analyze_plank_track(track, thresholds=None):
+    thresholds = {**EXERCISE_THRESHOLDS['plank hold'], **(thresholds or {})}
+    side = _best_side(track, ('SHOULDER', 'HIP', 'ANKLE'))
+    shoulder, hip, ankle = _points(track, 'SHOULDER', side), _points(track, 'HIP', side), _points(track, 'ANKLE', side)
+    body_angles = _angles(shoulder, hip, ankle)
+
+    # Holding: body straight and roughly horizontal
+    with np.errstate(invalid='ignore', divide='ignore'):
+        incline = np.abs(shoulder[:, 1] - ankle[:, 1]) / np.abs(shoulder[:, 0] - ankle[:, 0])
+        holding = (body_angles >= thresholds['min_body_angle']) & (incline <= thresholds['max_incline'])
+
+    timestamps = _timestamps(track)
+    hold_seconds = 0.0
+    if timestamps is not None and np.any(holding):
+        # Longest run of consecutive holding frames, measured on the source timeline
+        edges = np.diff(np.concatenate(([0], holding.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+        frame_time = np.median(np.diff(timestamps)) if len(timestamps) > 1 else 0.0
+        hold_seconds = float(np.max(timestamps[ends] - timestamps[starts] + frame_time))
+
+    detected = ~np.isnan(body_angles)
+    form_score = int(round(100 * holding[detected].mean())) if np.any(detected) else 0
+
+    feedback = []
+    if np.any(detected):
+        # Image y grows downwards, so sagging hips sit below the shoulder-ankle midline
+        sagging = np.mean(hip[detected, 1] > (shoulder[detected, 1] + ankle[detected, 1]) / 2) > 0.5
+        if form_score < 80:
+            feedback.append("Keep your hips from sagging" if sagging else "Lower your hips into a straight line")
+
+    hold_seconds = round(hold_seconds, 1)
+    return {
+        # Like the mobile app, a plank's "reps" are its hold time in whole seconds
+        'reps': int(round(hold_seconds)),
+        'hold_seconds': hold_seconds,
+        'form_score': form_score,
+        'feedback': feedback,
+        'summary': f"You held a plank for {hold_seconds} seconds with a form score of {form_score}%.",
+    }
+
+
+@register_analyzer('vertical jump')
+def analyze_vertical_jump_track(track, thresholds=None):
+    thresholds = {**EXERCISE_THRESHOLDS['vertical jump'], **(thresholds or {})}
+    hips = (_points(track, 'HIP', 'LEFT') + _points(track, 'HIP', 'RIGHT')) / 2
+    ankles = (_points(track, 'ANKLE', 'LEFT') + _points(track, 'ANKLE', 'RIGHT')) / 2
+    shoulders = (_points(track, 'SHOULDER', 'LEFT') + _points(track, 'SHOULDER', 'RIGHT')) / 2
+
+    detected = ~np.isnan(hips[:, 1])
+    if not np.any(detected):
+        return {'reps': 0, 'jump_count': 0, 'form_score': 0, 'feedback': [],
+                'summary': "No jumps were detected."}
+
+    # Image y grows downwards: rise is how far the hips are above their standing height,
+    # normalised by body length so it does not depend on camera distance
+    standing_hip_y = np.nanmedian(hips[:, 1])
+    body_length = np.nanmedian(np.linalg.norm(shoulders - ankles, axis=1)) or 1.0
+    rise = (standing_hip_y - hips[:, 1]) / body_length
+
+    jumps, _, _ = count_hysteresis_reps(rise, thresholds['takeoff_rise'], thresholds['landing_rise'])
+
+    best_flight = 0.0
+    timestamps = _timestamps(track)
+    with np.errstate(invalid='ignore'):
+        airborne = rise > thresholds['takeoff_rise']
+    if timestamps is not None and np.any(airborne):
+        edges = np.diff(np.concatenate(([0], airborne.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+        best_flight = float(np.max(timestamps[ends] - timestamps[starts]))
+
+    # Flight-time method: h = g * t^2 / 8
+    jump_height_cm = round(GRAVITY * best_flight ** 2 / 8 * 100, 1)
+    form_score = 100 if jumps else 0
+    feedback = []
+    if jumps and jump_height_cm < 20:
+        feedback.append("Swing your arms and drive through your hips for more height")
+
+    return {
+        'reps': jumps,
+        'jump_count': jumps,
+        'best_flight_time_s': round(best_flight, 3),
+        'estimated_jump_height_cm': jump_height_cm,
+        'form_score': form_score,
+        'feedback': feedback,
+        'summary': f"You performed {jumps} jumps; best estimated height {jump_height_cm} cm.",
+    }
+
+
+def motion_threshold_for(exercise_types):
+    """Gate threshold for one pass over several exercises: the most sensitive wins"""
+    return min(EXERCISE_MOTION_THRESHOLDS.get(name, 0.0) for name in exercise_types)
+
+
+def run_analyzers(track, exercise_types, thresholds=None):
+    """Score one landmark track with several exercise analyzers"""
+    thresholds = thresholds or {}
+    return {name: EXERCISE_ANALYZERS[name](track, thresholds.get(name)) for name in exercise_types}
+
+
+def analyze_video(video_path, exercise_types=None, profile_name=None, pose=None, progress_callback=None,
+                  track_key=None, timings=None, motion_threshold=None, deadline=None):
+    """Run one decode and pose pass over a video and score it for each requested exercise.
+
+    With track_key (the video's content hash) the landmark track is also persisted
+    for later re-scoring, and its reference is returned as 'landmark_track'.
+    timings, a StageTimings, collects per-stage durations. A motion_threshold
+    enables the MotionGate (see motion_threshold_for); by default every frame is
+    analysed. With a deadline (time.time() timestamp) sampling degrades to finish
+    in time and the result may be flagged approximate; approximate tracks are not
+    persisted.
+    """
+    exercise_types = parse_exercise_types(exercise_types)
+    profile = get_profile(profile_name)
+    pose_context = contextlib.nullcontext(pose) if pose is not None else create_pose(profile)
+    motion_gate = MotionGate(motion_threshold) if motion_threshold else None
+    budget = AnalysisBudget(deadline)
+
+    with pose_context as pose:
+        track = extract_landmarks(video_path, profile, pose, progress_callback, timings, motion_gate, budget)
+
+    return build_video_result(track, exercise_types, profile_name, budget, motion_gate, timings, track_key)
+
+
+def build_video_result(track, exercise_types, profile_name, budget, motion_gate=None, timings=None, track_key=None):
+    """Score a video's landmark track and assemble the analysis result.
+
+    Shared by analyze_video and the sharded pool path, which stitches the track,
+    budget and motion gate together from several segments first.
+    """
+    with measure_stage(timings, 'counting'):
+        exercises = run_analyzers(track, exercise_types)
+    result = {
+        'exercise_types': exercise_types,
+        'exercises': exercises,
+        'total_frames': track.total_frames,
+        'frames_analyzed': len(track),
+        'profile': profile_name or DEFAULT_PROFILE,
+        'sampling': budget.to_dict(len(track)),
+        # Degraded sampling or a stop before the end of the video
+        'approximate': budget.approximate,
+    }
+    if motion_gate is not None:
+        result['motion_gate'] = motion_gate.to_dict()
+
+    # Keep the original top-level sit-up fields for existing clients
+    primary = exercises.get('sit-ups') or exercises[exercise_types[0]]
+    result.update({
+        'sit_up_count': exercises['sit-ups']['sit_up_count'] if 'sit-ups' in exercises else 0,
+        'form_score': primary['form_score'],
+        'feedback': primary['feedback'],
+    })
+
+    if track_key and not budget.approximate:
+        result['landmark_track'] = save_track(track, track_key, profile_name or DEFAULT_PROFILE)
+    return result
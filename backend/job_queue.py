@@ -0,0 +1,240 @@
+import os
+import json
+import uuid
+import sqlite3
+import datetime
+import threading
+from pose_pool import analyze_in_pool
+from database import db
+from result_cache import result_cache
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# SQLite file holding queued/running/finished analysis jobs, so they survive restarts
+JOB_DB_PATH = os.getenv('ANALYSIS_JOB_DB', os.path.join(BACKEND_DIR, 'analysis_jobs.db'))
+# Uploaded videos waiting for analysis are kept here until their job finishes
+JOB_VIDEO_DIR = os.getenv('ANALYSIS_JOB_DIR', os.path.join(BACKEND_DIR, 'analysis_jobs'))
+# Maximum number of jobs analysed at the same time
+JOB_CONCURRENCY = int(os.getenv('ANALYSIS_JOB_CONCURRENCY', '2'))
+
+
+def _connect(db_path):
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class JobProgressReporter:
+    """Picklable progress callback that records frame progress for a job.
+
+    It runs inside the pose worker process and writes straight to the job database.
+    """
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self._connection = None
+
+    def __getstate__(self):
+        return {'db_path': self.db_path, 'job_id': self.job_id, '_connection': None}
+
+    def __call__(self, frames_processed, total_frames):
+        if self._connection is None:
+            self._connection = _connect(self.db_path)
+        self._connection.execute(
+            "UPDATE jobs SET frames_processed = ?, total_frames = ?, updated_at = ? WHERE id = ?",
+            (frames_processed, total_frames, _now(), self.job_id)
+        )
+
+
+class JobQueue:
+    """Durable SQLite-backed queue of video analysis jobs"""
+
+    def __init__(self, db_path=JOB_DB_PATH, video_dir=JOB_VIDEO_DIR, concurrency=JOB_CONCURRENCY):
+        self.db_path = db_path
+        self.video_dir = video_dir
+        self.concurrency = max(1, concurrency)
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._start_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self):
+        # sqlite3 connections are not shared between threads
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = _connect(self.db_path)
+        return self._local.connection
+
+    def initialize(self):
+        """Create the jobs table and requeue jobs interrupted by a restart"""
+        if self._initialized:
+            return
+        # Request threads and job workers may all get here first; migrate only once
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(self.video_dir, exist_ok=True)
+            connection = self._connection()
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                video_path TEXT NOT NULL,
+                profile TEXT,
+                user_id INTEGER,
+                save_session INTEGER DEFAULT 0,
+                frames_processed INTEGER DEFAULT 0,
+                total_frames INTEGER DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """)
+            columns = {row['name'] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if 'cache_key' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+            if 'exercise_types' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN exercise_types TEXT")
+            if 'track_key' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN track_key TEXT")
+            if 'motion_threshold' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN motion_threshold REAL")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            requeued = connection.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (_now(),)
+            ).rowcount
+            if requeued:
+                print(f"🔁 Requeued {requeued} interrupted analysis jobs")
+            self._initialized = True
+
+    def new_video_path(self, suffix=".mp4"):
+        """Return a path where an upload for a new job can be stored"""
+        self.initialize()
+        return os.path.join(self.video_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def submit(self, video_path, profile_name=None, user_id=None, save_session=False, cache_key=None,
+               exercise_types=None, track_key=None, motion_threshold=None):
+        """Queue a video for analysis and return the job id"""
+        self.initialize()
+        job_id = uuid.uuid4().hex
+        now = _now()
+        self._connection().execute(
+            """
+            INSERT INTO jobs (id, status, video_path, profile, exercise_types, user_id, save_session, cache_key,
+                              track_key, motion_threshold, created_at, updated_at)
+            VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, video_path, profile_name, ','.join(exercise_types or []) or None, user_id,
+             int(bool(save_session)), cache_key, track_key, motion_threshold, now, now)
+        )
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return a job's status, progress and result, or None if it does not exist"""
+        self.initialize()
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'profile': row['profile'],
+            'progress': {
+                'frames_processed': row['frames_processed'],
+                'total_frames': row['total_frames'],
+            },
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def _claim_next(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (_now(), row['id'])
+                )
+            connection.execute("COMMIT")
+            return row
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _finish(self, job_id, status, result=None, error=None):
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, _now(), job_id)
+        )
+
+    def _run_job(self, job):
+        try:
+            progress = JobProgressReporter(self.db_path, job['id'])
+            exercise_types = job['exercise_types'].split(',') if job['exercise_types'] else None
+            result = analyze_in_pool(job['video_path'], job['profile'], progress_callback=progress,
+                                     exercise_types=exercise_types, track_key=job['track_key'],
+                                     motion_threshold=job['motion_threshold'])
+            if job['cache_key']:
+                result_cache.put(job['cache_key'], dict(result))
+
+            if job['save_session'] and job['user_id']:
+                # One exercise_sessions row per analysed exercise
+                result['session_saved'] = all([
+                    db.insert_exercise_session(
+                        job['user_id'], name, result.get('landmark_track', ''), exercise['reps'],
+                        exercise['form_score'], "; ".join(exercise['feedback'])
+                    )
+                    for name, exercise in result['exercises'].items()
+                ])
+
+            self._finish(job['id'], 'completed', result=result)
+        except Exception as e:
+            print(f"❌ Analysis job {job['id']} failed: {e}")
+            self._finish(job['id'], 'failed', error=str(e))
+        finally:
+            if os.path.exists(job['video_path']):
+                os.remove(job['video_path'])
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job = self._claim_next()
+            except Exception as e:
+                print(f"❌ Could not claim analysis job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run_job(job)
+
+    def start(self):
+        """Start the job workers; safe to call more than once"""
+        with self._start_lock:
+            if self._workers:
+                return
+            self.initialize()
+            for i in range(self.concurrency):
+                worker = threading.Thread(target=self._worker_loop, name=f"analysis-job-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            print(f"✅ Analysis job queue started with concurrency {self.concurrency}")
+
+
+# Global job queue instance
+job_queue = JobQueue()
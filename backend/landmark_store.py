@@ -0,0 +1,106 @@
+import os
+import struct
+import numpy as np  # pyright: ignore[reportMissingImports]
+from analysis import LANDMARK_COUNT, LANDMARK_FIELDS, LandmarkTrack
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Where compact landmark tracks are written, one file per (video content hash, profile)
+LANDMARK_STORE_DIR = os.getenv('LANDMARK_STORE_DIR', os.path.join(BACKEND_DIR, 'landmark_tracks'))
+# Persist every analysed video's track, not only when a request asks for it
+PERSIST_LANDMARK_TRACKS = os.getenv('PERSIST_LANDMARK_TRACKS', '').lower() in ('1', 'true', 'yes', 'on')
+
+# File layout: 64-byte header, int32 source frame indices, then float16 landmarks
+# shaped (frames, 33, 4), each section starting on a 64-byte boundary
+TRACK_MAGIC = b'SAPLMK'
+TRACK_VERSION = 1
+HEADER_FORMAT = '<6sHIIfHH'  # magic, version, frames, total_frames, fps, landmarks, fields
+HEADER_SIZE = 64
+TRACK_SUFFIX = '.lmk'
+REFERENCE_PREFIX = 'landmarks://'
+
+
+def _align(offset):
+    return (offset + 63) // 64 * 64
+
+
+def track_path(content_hash, profile_name, store_dir=None):
+    """Path of the track for a video content hash analysed with a profile"""
+    store_dir = store_dir or LANDMARK_STORE_DIR
+    return os.path.join(store_dir, content_hash[:2], f"{content_hash}.{profile_name}{TRACK_SUFFIX}")
+
+
+def track_reference(content_hash, profile_name):
+    """Reference stored in exercise_sessions.video_path for a persisted track"""
+    return f"{REFERENCE_PREFIX}{content_hash}/{profile_name}"
+
+
+def resolve_reference(reference, store_dir=None):
+    """Map a landmarks:// reference back to its track file, or None for other paths"""
+    if not reference or not reference.startswith(REFERENCE_PREFIX):
+        return None
+    content_hash, _, profile_name = reference[len(REFERENCE_PREFIX):].partition('/')
+    return track_path(content_hash, profile_name, store_dir)
+
+
+def save_track(track, content_hash, profile_name, store_dir=None):
+    """Write a LandmarkTrack in the compact float16 format and return its reference"""
+    path = track_path(content_hash, profile_name, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    frames = len(track)
+    header = struct.pack(HEADER_FORMAT, TRACK_MAGIC, TRACK_VERSION, frames, track.total_frames,
+                         track.fps, LANDMARK_COUNT, LANDMARK_FIELDS)
+    indices_offset = HEADER_SIZE
+    landmarks_offset = _align(indices_offset + frames * 4)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(np.ascontiguousarray(track.frame_indices, dtype='<i4').tobytes())
+        f.write(b'\0' * (landmarks_offset - indices_offset - frames * 4))
+        f.write(np.ascontiguousarray(track.landmarks, dtype='<f2').tobytes())
+    os.replace(tmp_path, path)
+    return track_reference(content_hash, profile_name)
+
+
+def move_track(old_key, new_key, profile_name, store_dir=None):
+    """Re-key a stored track (e.g. from an upload id to the finished upload's content hash)"""
+    new_path = track_path(new_key, profile_name, store_dir)
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    os.replace(track_path(old_key, profile_name, store_dir), new_path)
+    return track_reference(new_key, profile_name)
+
+
+def load_track(path):
+    """Memory-map a stored track; landmarks stay float16 on disk until touched"""
+    with open(path, 'rb') as f:
+        header = f.read(struct.calcsize(HEADER_FORMAT))
+    magic, version, frames, total_frames, fps, landmark_count, fields = struct.unpack(HEADER_FORMAT, header)
+    if magic != TRACK_MAGIC or version != TRACK_VERSION:
+        raise ValueError(f"{path} is not a version {TRACK_VERSION} landmark track")
+
+    landmarks_offset = _align(HEADER_SIZE + frames * 4)
+    if frames == 0:
+        frame_indices = np.zeros(0, dtype=np.int32)
+        landmarks = np.zeros((0, landmark_count, fields), dtype=np.float16)
+    else:
+        frame_indices = np.memmap(path, dtype='<i4', mode='r', offset=HEADER_SIZE, shape=(frames,))
+        landmarks = np.memmap(path, dtype='<f2', mode='r', offset=landmarks_offset,
+                              shape=(frames, landmark_count, fields))
+    return LandmarkTrack(landmarks, frame_indices, total_frames, fps)
+
+
+def iter_track_files(store_dir=None):
+    """Yield every stored track file"""
+    store_dir = store_dir or LANDMARK_STORE_DIR
+    for root, _, files in os.walk(store_dir):
+        for name in sorted(files):
+            if name.endswith(TRACK_SUFFIX):
+                yield os.path.join(root, name)
+
+
+def reference_for_path(path):
+    """Inverse of track_path for a stored file"""
+    content_hash, _, profile_name = os.path.basename(path)[:-len(TRACK_SUFFIX)].partition('.')
+    return track_reference(content_hash, profile_name)
@@ -0,0 +1,130 @@
+import os
+import zlib
+import struct
+import numpy as np  # pyright: ignore[reportMissingImports]
+from analysis import LANDMARK_COUNT, LANDMARK_FIELDS, AnalysisBudget, LandmarkTrack
+from exercises import build_video_result
+from metrics import FRAMES
+
+# Wire format of /upload-landmarks, for clients that run pose estimation on the
+# device and send landmarks instead of video. Little-endian, sections back to back:
+#   header       '<4sHHIf': magic, version, landmarks per frame (33), frames, fps
+#   timestamps   uint32 per frame, milliseconds since the start of the recording
+#   detected     uint8 per frame, 0 where no person was found
+#   coordinates  uint16 (frames, 33, 3): x, y, z mapped linearly from COORDINATE_RANGE
+#   visibility   uint8 (frames, 33): visibility mapped from [0, 1]
+# The whole stream may be gzip-compressed. fps is the camera frame rate; timestamps
+# are mapped to source frame indices with it (0 estimates it from the timestamps).
+STREAM_MAGIC = b'SAPL'
+STREAM_VERSION = 1
+STREAM_HEADER_FORMAT = '<4sHHIf'
+STREAM_HEADER_SIZE = struct.calcsize(STREAM_HEADER_FORMAT)
+# Normalised MediaPipe coordinates stray a little outside [0, 1]; this range keeps
+# them with a resolution of about 0.00006 (under 0.1 px on a 1280 px frame)
+COORDINATE_RANGE = (-2.0, 2.0)
+COORDINATE_LEVELS = 65535
+VISIBILITY_LEVELS = 255
+FRAME_BYTES = 4 + 1 + LANDMARK_COUNT * 3 * 2 + LANDMARK_COUNT
+# Longest stream accepted, 10 minutes at 60 fps by default
+MAX_STREAM_FRAMES = int(os.getenv('LANDMARK_STREAM_MAX_FRAMES', '36000'))
+MAX_STREAM_BYTES = STREAM_HEADER_SIZE + MAX_STREAM_FRAMES * FRAME_BYTES
+
+# Profile name results and persisted tracks of device landmarks are filed under
+DEVICE_PROFILE = 'device'
+
+
+def read_stream(file):
+    """Read an uploaded stream, inflating it if gzip-compressed; raises ValueError if too large"""
+    data = file.read(MAX_STREAM_BYTES + 1)
+    if data[:2] == b'\x1f\x8b':
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = inflater.decompress(data, MAX_STREAM_BYTES + 1)
+        except zlib.error:
+            raise ValueError("Landmark stream is not valid gzip data")
+    if len(data) > MAX_STREAM_BYTES:
+        raise ValueError(f"Landmark stream is longer than {MAX_STREAM_FRAMES} frames")
+    return data
+
+
+def encode_landmark_stream(landmarks, timestamps_ms, fps=0.0):
+    """Encode (frames, 33, 4) landmarks, NaN where nobody was found, and their timestamps.
+
+    The reference encoder for device clients; also used by test_landmarks.py.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    frames = len(landmarks)
+    detected = ~np.isnan(landmarks[:, 0, 0]) if frames else np.zeros(0, dtype=bool)
+    filled = np.nan_to_num(landmarks)
+
+    low, high = COORDINATE_RANGE
+    coordinates = np.rint((np.clip(filled[:, :, :3], low, high) - low) / (high - low) * COORDINATE_LEVELS)
+    visibility = np.rint(np.clip(filled[:, :, 3], 0.0, 1.0) * VISIBILITY_LEVELS)
+
+    header = struct.pack(STREAM_HEADER_FORMAT, STREAM_MAGIC, STREAM_VERSION, LANDMARK_COUNT, frames, fps)
+    return b''.join((
+        header,
+        np.rint(np.asarray(timestamps_ms, dtype=np.float64)).astype('<u4').tobytes(),
+        detected.astype(np.uint8).tobytes(),
+        coordinates.astype('<u2').tobytes(),
+        visibility.astype(np.uint8).tobytes(),
+    ))
+
+
+def decode_landmark_stream(data):
+    """Decode a landmark stream into a LandmarkTrack; raises ValueError if it is malformed"""
+    if len(data) < STREAM_HEADER_SIZE:
+        raise ValueError("Landmark stream is too short")
+    magic, version, landmark_count, frames, fps = struct.unpack_from(STREAM_HEADER_FORMAT, data)
+    if magic != STREAM_MAGIC or version != STREAM_VERSION:
+        raise ValueError(f"Not a version {STREAM_VERSION} landmark stream")
+    if landmark_count != LANDMARK_COUNT:
+        raise ValueError(f"Expected {LANDMARK_COUNT} landmarks per frame, got {landmark_count}")
+    if frames == 0:
+        raise ValueError("Landmark stream has no frames")
+    if frames > MAX_STREAM_FRAMES:
+        raise ValueError(f"Landmark stream is longer than {MAX_STREAM_FRAMES} frames")
+    if len(data) != STREAM_HEADER_SIZE + frames * FRAME_BYTES:
+        raise ValueError(f"Landmark stream should be {STREAM_HEADER_SIZE + frames * FRAME_BYTES} bytes "
+                         f"for {frames} frames, got {len(data)}")
+
+    offset = STREAM_HEADER_SIZE
+    timestamps = np.frombuffer(data, dtype='<u4', count=frames, offset=offset).astype(np.float64)
+    offset += frames * 4
+    detected = np.frombuffer(data, dtype=np.uint8, count=frames, offset=offset).astype(bool)
+    offset += frames
+    coordinates = np.frombuffer(data, dtype='<u2', count=frames * LANDMARK_COUNT * 3, offset=offset)
+    offset += frames * LANDMARK_COUNT * 3 * 2
+    visibility = np.frombuffer(data, dtype=np.uint8, count=frames * LANDMARK_COUNT, offset=offset)
+
+    if np.any(np.diff(timestamps) <= 0):
+        raise ValueError("Landmark timestamps must be strictly increasing")
+    if not fps > 0:
+        # Device inference may skip camera frames; the shortest gap is closest to one frame
+        fps = 1000.0 / np.min(np.diff(timestamps)) if frames > 1 else 30.0
+    frame_indices = np.rint(timestamps * fps / 1000.0).astype(np.int32)
+    if np.any(np.diff(frame_indices) <= 0):
+        raise ValueError("Landmark timestamps are closer together than one frame at the given fps")
+
+    low, high = COORDINATE_RANGE
+    landmarks = np.empty((frames, LANDMARK_COUNT, LANDMARK_FIELDS), dtype=np.float32)
+    landmarks[:, :, :3] = coordinates.reshape(frames, LANDMARK_COUNT, 3) * ((high - low) / COORDINATE_LEVELS) + low
+    landmarks[:, :, 3] = visibility.reshape(frames, LANDMARK_COUNT) / VISIBILITY_LEVELS
+    landmarks[~detected] = np.nan
+    return LandmarkTrack(landmarks, frame_indices, int(frame_indices[-1]) + 1, float(fps))
+
+
+def analyze_landmark_stream(data, exercise_types, track_key=None):
+    """Score a device landmark stream with the same analyzers as an uploaded video.
+
+    Returns a result shaped like exercises.analyze_video's. With track_key the
+    decoded track is persisted under DEVICE_PROFILE for later re-scoring.
+    """
+    track = decode_landmark_stream(data)
+    # Nothing was sampled on the server, so the budget only reports what was covered
+    budget = AnalysisBudget(max_video_seconds=None)
+    budget.frames_read = track.total_frames
+    budget.fps = track.fps
+    result = build_video_result(track, exercise_types, DEVICE_PROFILE, budget, track_key=track_key)
+    FRAMES.inc(len(track), source='device', kind='analyzed')
+    return result
@@ -0,0 +1,182 @@
+import json
+import time
+import threading
+import cv2  # pyright: ignore[reportMissingImports]
+import numpy as np  # pyright: ignore[reportMissingImports]
+from admission import Overloaded, live_gate
+from analysis import DEFAULT_PROFILE, SitUpCounter, create_pose, downscale, get_profile
+from metrics import FRAMES
+
+# Largest encoded frame accepted from a client
+LIVE_MAX_FRAME_BYTES = 2 * 1024 * 1024
+# Close connections that send nothing for this many seconds
+LIVE_IDLE_TIMEOUT = 30
+
+
+class LiveSession:
+    """Per-connection pose and rep-counter state for live analysis.
+
+    Frames are decoded and analysed on a worker thread that always takes the newest
+    frame; frames arriving while it is busy replace the pending one and are counted
+    as dropped, so a slow server never builds up a backlog.
+    """
+
+    def __init__(self, ws, profile_name=None):
+        self.ws = ws
+        self.profile_name = profile_name or DEFAULT_PROFILE
+        self.profile = get_profile(self.profile_name)
+        self.counter = SitUpCounter()
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self._pending = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._worker = None
+        self._error = None
+
+    def send(self, message):
+        with self._send_lock:
+            self.ws.send(json.dumps(message))
+
+    def submit(self, frame_bytes):
+        """Hand a newly received frame to the worker, replacing any unprocessed one"""
+        with self._condition:
+            self.frames_received += 1
+            if self._pending is not None:
+                self.frames_dropped += 1
+                FRAMES.inc(source='live', kind='dropped')
+            self._pending = (self.frames_received - 1, frame_bytes, time.perf_counter())
+            self._condition.notify()
+
+    def _next_frame(self):
+        with self._condition:
+            while self._pending is None and not self._closed:
+                self._condition.wait()
+            frame, self._pending = self._pending, None
+            return frame
+
+    def _process(self, pose):
+        while True:
+            item = self._next_frame()
+            if item is None:
+                break
+            frame_index, frame_bytes, received_at = item
+
+            frame = cv2.imdecode(np.frombuffer(frame_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                self.send({"type": "error", "message": "Could not decode frame", "frame": frame_index})
+                continue
+
+            image = cv2.cvtColor(downscale(frame, self.profile['max_dimension']), cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            results = pose.process(image)
+            self.frames_processed += 1
+            FRAMES.inc(source='live', kind='analyzed')
+
+            hints = []
+            detected = results.pose_landmarks is not None
+            if detected:
+                try:
+                    hints = self.counter.update(results.pose_landmarks.landmark, frame_index)
+                except IndexError:
+                    detected = False
+
+            self.send({
+                "type": "update",
+                "frame": frame_index,
+                "person_detected": detected,
+                "sit_up_count": self.counter.sit_up_count,
+                "stage": self.counter.stage,
+                "hints": hints,
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 1),
+            })
+
+    def _run_worker(self):
+        try:
+            with create_pose(self.profile) as pose:
+                self._process(pose)
+        except Exception as e:
+            self._error = e
+            with self._condition:
+                self._closed = True
+
+    def start(self):
+        self._worker = threading.Thread(target=self._run_worker, name="live-analysis", daemon=True)
+        self._worker.start()
+
+    def finish(self):
+        """Stop accepting frames, let the worker drain and return the session summary"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._worker:
+            self._worker.join()
+        summary = self.counter.result()
+        summary.update({
+            "type": "summary",
+            "profile": self.profile_name,
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+        })
+        if self._error is not None:
+            summary["error"] = str(self._error)
+        return summary
+
+    @property
+    def failed(self):
+        return self._error is not None
+
+
+def handle_live_connection(ws, profile_name=None):
+    """Run one live analysis connection until the client sends {"type": "end"} or disconnects.
+
+    Binary messages are encoded (JPEG/PNG) frames; the server replies with an
+    'update' message per analysed frame and a final 'summary'. When LIVE_MAX_SESSIONS
+    sessions are already running, the client gets a 'busy' error and is disconnected.
+    """
+    try:
+        session = LiveSession(ws, profile_name)
+    except ValueError as e:
+        ws.send(json.dumps({"type": "error", "message": str(e)}))
+        return
+
+    try:
+        token = live_gate.acquire()
+    except Overloaded as e:
+        ws.send(json.dumps({"type": "error", "message": "Server busy, please retry later", "busy": True,
+                            "retry_after": e.retry_after}))
+        return
+    try:
+        run_live_session(ws, session)
+    finally:
+        live_gate.release(token)
+
+
+def run_live_session(ws, session):
+    """Receive frames for an admitted session until the client ends it, then send the summary"""
+    session.start()
+    session.send({"type": "ready", "profile": session.profile_name})
+    try:
+        while not session.failed:
+            message = ws.receive(timeout=LIVE_IDLE_TIMEOUT)
+            if message is None:
+                break
+            if isinstance(message, bytes):
+                if len(message) > LIVE_MAX_FRAME_BYTES:
+                    session.send({"type": "error", "message": "Frame too large"})
+                    continue
+                session.submit(message)
+                continue
+            try:
+                control = json.loads(message)
+            except ValueError:
+                continue
+            # Control messages are JSON objects; anything else is ignored like bad JSON
+            if isinstance(control, dict) and control.get('type') == 'end':
+                break
+    finally:
+        summary = session.finish()
+    session.send(summary)
@@ -0,0 +1,235 @@
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+import cv2  # pyright: ignore[reportMissingImports]
+from analysis import (
+    DEFAULT_PROFILE, MAX_VIDEO_SECONDS, AnalysisBudget, MotionGate, StageTimings, create_pose, extract_landmarks,
+    get_profile, plan_segments, stitch_tracks
+)
+from exercises import analyze_video, build_video_result, parse_exercise_types
+from metrics import ANALYSIS_QUEUE_SECONDS, ANALYSIS_SECONDS, ANALYSIS_STAGE_SECONDS, FRAMES
+
+# One worker per core by default; each worker keeps warm Pose instances
+POOL_SIZE = int(os.getenv('POSE_POOL_SIZE', os.cpu_count() or 1))
+# Recycle a worker after this many videos to bound memory growth in native code
+POOL_MAX_TASKS = int(os.getenv('POSE_POOL_MAX_TASKS', '100'))
+# Scheduling priority penalty for pose workers, so the server's request threads stay
+# responsive while every core is busy analysing (POSIX only; 0 disables)
+POOL_WORKER_NICE = int(os.getenv('POSE_WORKER_NICE', '10'))
+# Videos at least this many seconds long are split into time segments that several
+# workers analyse at once (0 disables). Cuts latency for long recordings while
+# workers are idle; each extra segment costs a seek and a second of warm-up.
+SHARD_MIN_SECONDS = float(os.getenv('ANALYSIS_SHARD_MIN_SECONDS', '0'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Per-worker Pose instances, keyed by profile name
+_worker_poses = {}
+
+
+def _get_worker_pose(profile_name):
+    """Return this worker's warm Pose instance for a profile, creating it on first use"""
+    pose = _worker_poses.get(profile_name)
+    if pose is None:
+        pose = create_pose(get_profile(profile_name))
+        _worker_poses[profile_name] = pose
+    return pose
+
+
+def _init_worker():
+    """Load the default profile's model once when the worker process starts"""
+    if POOL_WORKER_NICE and hasattr(os, 'nice'):
+        os.nice(POOL_WORKER_NICE)
+    _get_worker_pose(DEFAULT_PROFILE)
+    atexit.register(_close_worker_poses)
+
+
+def _close_worker_poses():
+    for pose in _worker_poses.values():
+        pose.close()
+    _worker_poses.clear()
+
+
+def _analyze_task(video_path, profile_name, exercise_types, progress_callback, track_key, motion_threshold=None,
+                  deadline=None):
+    profile_name = profile_name or DEFAULT_PROFILE
+    pose = _get_worker_pose(profile_name)
+    # Drop tracking state left over from the previous video
+    pose.reset()
+    timings = StageTimings()
+    started = time.perf_counter()
+    result = analyze_video(video_path, exercise_types, profile_name, pose=pose,
+                           progress_callback=progress_callback, track_key=track_key, timings=timings,
+                           motion_threshold=motion_threshold, deadline=deadline)
+    # Metrics live in the server process; ship this video's timings back with the result
+    result['timing'] = {'seconds': time.perf_counter() - started, 'stages': timings.to_dict()}
+    return result
+
+
+def _extract_segment_task(video_path, profile_name, segment, motion_threshold, deadline):
+    """Pose pass over one time segment of a video; the server stitches and scores the segments"""
+    profile_name = profile_name or DEFAULT_PROFILE
+    pose = _get_worker_pose(profile_name)
+    # Tracking state from another video or segment must not carry over the seek
+    pose.reset()
+    read_start, _, end = segment
+    timings = StageTimings()
+    motion_gate = MotionGate(motion_threshold) if motion_threshold else None
+    budget = AnalysisBudget(deadline)
+    started = time.perf_counter()
+    track = extract_landmarks(video_path, get_profile(profile_name), pose, timings=timings, motion_gate=motion_gate,
+                              budget=budget, start_frame=read_start, end_frame=end)
+    return track, budget, motion_gate, {'seconds': time.perf_counter() - started, 'stages': timings.to_dict()}
+
+
+def video_segments(video_path):
+    """(segments, frame_count) to shard a video's analysis by, or None to run it on one worker"""
+    # Streamed uploads are read from a FIFO, which can neither be probed nor seeked
+    if not SHARD_MIN_SECONDS or POOL_SIZE < 2 or not os.path.isfile(video_path):
+        return None
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    finally:
+        cap.release()
+    if not fps or frame_count < SHARD_MIN_SECONDS * fps:
+        return None
+    if MAX_VIDEO_SECONDS:
+        frame_count = min(frame_count, int(MAX_VIDEO_SECONDS * fps))
+    segments = plan_segments(frame_count, fps, POOL_SIZE)
+    return (segments, frame_count) if len(segments) > 1 else None
+
+
+def _analyze_sharded(video_path, segments, frame_count, profile_name, exercise_types, progress_callback, track_key,
+                     motion_threshold, deadline, timeout):
+    """Analyse a video's segments on several workers, then stitch and score the whole track here"""
+    exercise_types = parse_exercise_types(exercise_types)
+    started = time.perf_counter()
+    pool = get_pool()
+    tasks = [pool.apply_async(_extract_segment_task, (video_path, profile_name, segment, motion_threshold, deadline))
+             for segment in segments]
+
+    tracks = []
+    budget = AnalysisBudget(deadline)
+    motion_gate = MotionGate(motion_threshold) if motion_threshold else None
+    timings = StageTimings()
+    slowest = 0.0
+    for task, segment in zip(tasks, segments):
+        remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - started))
+        track, segment_budget, segment_gate, timing = task.get(remaining)
+        tracks.append(track)
+        budget.merge(segment_budget, segment[1])
+        if motion_gate is not None:
+            motion_gate.merge(segment_gate)
+        timings.merge(timing['stages'])
+        slowest = max(slowest, timing['seconds'])
+        if progress_callback:
+            progress_callback(budget.frames_read, max(frame_count, budget.frames_read))
+
+    track = stitch_tracks(tracks, segments)
+    counting_started = time.perf_counter()
+    result = build_video_result(track, exercise_types, profile_name, budget, motion_gate, timings, track_key)
+    result['segments'] = len(segments)
+    # The segments ran side by side, so the video took as long as the slowest one
+    result['timing'] = {'seconds': slowest + time.perf_counter() - counting_started, 'stages': timings.to_dict()}
+    return result
+
+
+def _record_analysis(result, wall_seconds, timings):
+    timing = result.pop('timing', None)
+    FRAMES.inc(result.get('total_frames', 0), source='video', kind='read')
+    FRAMES.inc(result.get('frames_analyzed', 0), source='video', kind='analyzed')
+    if 'motion_gate' in result:
+        FRAMES.inc(result['motion_gate']['frames_skipped'], source='video', kind='motion_skipped')
+    if timing is None:
+        return
+    ANALYSIS_SECONDS.observe(timing['seconds'], profile=result.get('profile', DEFAULT_PROFILE))
+    pool_wait = max(0.0, wall_seconds - timing['seconds'])
+    ANALYSIS_QUEUE_SECONDS.observe(pool_wait)
+    for stage, info in timing['stages'].items():
+        ANALYSIS_STAGE_SECONDS.observe(info['seconds'], stage=stage)
+    if timings is not None:
+        timings.add('pool_wait', pool_wait)
+        timings.add('analysis', timing['seconds'])
+        timings.merge(timing['stages'])
+
+
+def get_pool():
+    """Return the shared worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps MediaPipe/OpenCV threads of the server process out of the workers
+            context = multiprocessing.get_context('spawn')
+            _pool = context.Pool(
+                processes=POOL_SIZE,
+                initializer=_init_worker,
+                maxtasksperchild=POOL_MAX_TASKS,
+            )
+            print(f"✅ Pose worker pool started with {POOL_SIZE} workers")
+        return _pool
+
+
+def _worker_ready(_):
+    # Hold the worker briefly so workers still loading the model get a chance at the next round
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def warm_up_pool():
+    """Start the pool and wait until each of its workers has loaded the default model"""
+    pool = get_pool()
+    # Workers run their initializer (model load) before taking a task, but a warm
+    # worker may take several tasks while others load; repeat until every worker answered
+    ready = set()
+    while len(ready) < POOL_SIZE:
+        ready.update(pool.map(_worker_ready, range(POOL_SIZE - len(ready)), chunksize=1))
+
+
+def analyze_in_pool(video_path, profile_name=None, timeout=None, progress_callback=None, exercise_types=None,
+                    track_key=None, timings=None, motion_threshold=None, deadline=None):
+    """Analyze a video on one of the warm pool workers and wait for the result.
+
+    One pose pass feeds every analyzer in exercise_types (default: sit-ups).
+    progress_callback runs inside the worker process, so it must be picklable.
+    track_key persists the landmark track under that content hash.
+    timings, a StageTimings, receives the pool wait and the worker's per-stage times.
+    motion_threshold enables the motion gate (off by default).
+    deadline, a time.time() timestamp, bounds the analysis including its wait for a
+    worker; the result is then flagged approximate if sampling had to degrade.
+    Videos longer than ANALYSIS_SHARD_MIN_SECONDS are split into time segments
+    analysed on several workers at once, see video_segments.
+    """
+    started = time.perf_counter()
+    sharding = video_segments(video_path)
+    if sharding is not None:
+        segments, frame_count = sharding
+        result = _analyze_sharded(video_path, segments, frame_count, profile_name, exercise_types, progress_callback,
+                                  track_key, motion_threshold, deadline, timeout)
+        _record_analysis(result, time.perf_counter() - started, timings)
+        return result
+
+    task = get_pool().apply_async(
+        _analyze_task,
+        (video_path, profile_name, exercise_types, progress_callback, track_key, motion_threshold, deadline)
+    )
+    result = task.get(timeout)
+    _record_analysis(result, time.perf_counter() - started, timings)
+    return result
+
+
+def shutdown_pool():
+    """Stop all workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
+
+
+atexit.register(shutdown_pool)
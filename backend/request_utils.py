@@ -0,0 +1,3 @@
+def is_truthy(value):
+    """Interpret a form/query flag such as async=true"""
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
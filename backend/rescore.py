@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Re-score stored landmark tracks for SAP Sports Analysis Platform
+Runs the exercise analyzers over persisted landmark tracks instead of re-decoding
+videos, e.g. after tuning thresholds or fixing a counter.
+
+Usage: python rescore.py [--exercise sit-ups,push-ups] [--thresholds '{"sit-ups": {"up_angle": 85}}']
+                         [--from-db] [--update-db] [--output rescored.jsonl] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+from multiprocessing import Pool
+from exercises import parse_exercise_types, run_analyzers
+from landmark_store import (
+    REFERENCE_PREFIX, iter_track_files, load_track, reference_for_path, resolve_reference
+)
+
+
+def rescore_track(task):
+    """Score one stored track; runs in a worker process"""
+    reference, path, exercise_types, thresholds = task
+    try:
+        track = load_track(path)
+        exercises = run_analyzers(track, exercise_types, thresholds)
+    except (OSError, ValueError) as e:
+        return {'landmark_track': reference, 'error': str(e)}
+    for exercise in exercises.values():
+        exercise.pop('summary', None)
+    return {'landmark_track': reference, 'frames_analyzed': len(track), 'exercises': exercises}
+
+
+def tracks_from_db():
+    """Yield (reference, exercise types) for sessions saved with a landmark track"""
+    from database import db
+    rows = db.execute_query(
+        "SELECT DISTINCT video_path, exercise_type FROM exercise_sessions WHERE video_path LIKE ?",
+        (f"{REFERENCE_PREFIX}%",)
+    ) or []
+    by_reference = {}
+    for row in rows:
+        by_reference.setdefault(row['video_path'], []).append(row['exercise_type'])
+    return by_reference.items()
+
+
+def update_sessions(result):
+    """Write re-scored counts back to every session that references the track"""
+    from database import db
+    update_query = """
+    UPDATE exercise_sessions SET sit_up_count = ?, form_score = ?, feedback = ?
+    WHERE video_path = ? AND exercise_type = ?
+    """
+    return all(
+        db.execute_update(update_query, (exercise['reps'], exercise['form_score'],
+                                         "; ".join(exercise['feedback']), result['landmark_track'], name))
+        for name, exercise in result['exercises'].items()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score persisted landmark tracks")
+    parser.add_argument('--exercise', default=None,
+                        help="Comma-separated exercise types to score (default: sit-ups, or each session's type with --from-db)")
+    parser.add_argument('--thresholds', default=None,
+                        help="JSON object of per-exercise threshold overrides")
+    parser.add_argument('--from-db', action='store_true',
+                        help="Only re-score tracks referenced by saved exercise sessions")
+    parser.add_argument('--update-db', action='store_true',
+                        help="Write the new counts back to exercise_sessions (implies --from-db)")
+    parser.add_argument('--output', default=None, help="Write one JSON line per track to this file")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    args = parser.parse_args()
+
+    try:
+        thresholds = json.loads(args.thresholds) if args.thresholds else None
+        requested = parse_exercise_types(args.exercise) if args.exercise else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print("🔁 SAP Landmark Track Re-scoring")
+    print("=" * 60)
+
+    tasks = []
+    if args.from_db or args.update_db:
+        for reference, session_types in tracks_from_db():
+            path = resolve_reference(reference)
+            if not os.path.exists(path):
+                print(f"⚠️  Missing track for {reference}")
+                continue
+            try:
+                exercise_types = requested or parse_exercise_types(session_types)
+            except ValueError as e:
+                print(f"⚠️  Skipping {reference}: {e}")
+                continue
+            tasks.append((reference, path, exercise_types, thresholds))
+    else:
+        for path in iter_track_files():
+            tasks.append((reference_for_path(path), path, requested or parse_exercise_types(), thresholds))
+
+    if not tasks:
+        print("❌ No landmark tracks found")
+        sys.exit(1)
+
+    output = open(args.output, 'w') if args.output else None
+    failed = updated = 0
+    try:
+        with Pool(min(args.workers, len(tasks))) as pool:
+            for result in pool.imap_unordered(rescore_track, tasks):
+                if 'error' in result:
+                    failed += 1
+                    print(f"❌ {result['landmark_track']}: {result['error']}")
+                else:
+                    counts = ", ".join(f"{name}={exercise['reps']}" for name, exercise in result['exercises'].items())
+                    print(f"  {result['landmark_track']}  {counts}")
+                    if args.update_db and update_sessions(result):
+                        updated += 1
+                if output:
+                    output.write(json.dumps(result) + "\n")
+    finally:
+        if output:
+            output.close()
+
+    print("\n" + "=" * 60)
+    print(f"✅ Re-scored {len(tasks) - failed} of {len(tasks)} tracks")
+    if args.update_db:
+        print(f"💾 Updated sessions for {updated} tracks")
+        if updated:
+            from database import db
+            if db.rebuild_daily_rollups():
+                print("📊 Dashboard rollups rebuilt")
+    if args.output:
+        print(f"📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Number of results kept in the in-process LRU tier
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv('RESULT_CACHE_MEMORY_ENTRIES', '256'))
+# Directory and size budget of the on-disk tier
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(BACKEND_DIR, 'result_cache'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload_with_hash(file_storage, path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Stream an uploaded file to disk and return the SHA-256 of its bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash, profile_name, algorithm_version, exercise_types=(), motion_threshold=None):
+    """Combine the video hash with everything that changes the analysis output"""
+    exercises = ','.join(sorted(exercise_types))
+    key = f"{content_hash}:{profile_name}:{algorithm_version}:{exercises}"
+    if motion_threshold is not None:
+        key += f":motion={motion_threshold:g}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + size-bounded disk) cache of analysis results"""
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_entries=RESULT_CACHE_MEMORY_ENTRIES,
+                 max_disk_bytes=RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return (result, tier) for a cached key, or (None, None) on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return self._memory[key], 'memory'
+
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            # Touch the file so disk eviction is least-recently-used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats['misses'] += 1
+            return None, None
+
+        with self._lock:
+            self._remember(key, result)
+            self._stats['disk_hits'] += 1
+        return result, 'disk'
+
+    def put(self, key, result):
+        """Store a result in both tiers.
+
+        Approximate results (cut short or sampled more coarsely to meet a deadline)
+        are not stored, so the next request for the video gets a full analysis.
+        """
+        if result.get('approximate'):
+            return
+        with self._lock:
+            self._remember(key, result)
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"⚠️  Could not write result cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_disk_bytes(self):
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self):
+        # Drop least recently used files until the store is back under 90% of its budget
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self._stats['evictions'] += 1
+            except OSError:
+                continue
+        self._disk_bytes = total
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Global result cache instance
+result_cache = ResultCache()
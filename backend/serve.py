@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Production server for SAP Sports Analysis Platform
+Serves the Flask app from one process with a fixed thread budget instead of the
+debug server. There are enough threads for every request the admission gates can
+hold (running or queued) in both tiers, so a saturated analysis tier never takes
+the threads /login and /health need. Overload beyond that is answered with 429.
+
+Uses gunicorn (gthread worker, which also serves the /live-analysis WebSocket) when it is
+installed, otherwise waitress (plain HTTP only, works on Windows).
+
+--mode api serves only accounts, history and dashboards and never loads the
+vision stack; --mode analysis serves uploads and live analysis and warms the pose
+workers before accepting requests.
+
+Usage: python serve.py [--host 0.0.0.0] [--port 5000] [--mode all|api|analysis]
+                       [--server gunicorn|waitress]
+"""
+
+import argparse
+import os
+from admission import (
+    ANALYSIS_MAX_CONCURRENT, ANALYSIS_MAX_QUEUE, API_MAX_CONCURRENT, API_MAX_QUEUE, LIVE_MAX_SESSIONS
+)
+from app import APP_MODES, create_app, start_background_services, warm_up
+
+# Threads reserved for /live-analysis WebSocket connections: the admitted sessions plus
+# a few to turn away connections beyond LIVE_MAX_SESSIONS
+LIVE_THREADS = int(os.getenv('SERVE_LIVE_THREADS', str(LIVE_MAX_SESSIONS + 4)))
+# Seconds an idle keep-alive connection is kept open
+KEEPALIVE_SECONDS = int(os.getenv('SERVE_KEEPALIVE_SECONDS', '5'))
+
+
+def thread_budget(mode):
+    """Request threads needed so admitted requests never wait for a server thread"""
+    # Every route that is not analysis goes through the API gate, in both modes
+    threads = API_MAX_CONCURRENT + API_MAX_QUEUE
+    if mode in ('analysis', 'all'):
+        threads += ANALYSIS_MAX_CONCURRENT + ANALYSIS_MAX_QUEUE + LIVE_THREADS
+    return threads
+
+
+def load_app(mode):
+    app = create_app(mode)
+    start_background_services(app)
+    warm_up(app)
+    return app
+
+
+def run_gunicorn(host, port, threads, mode):
+    from gunicorn.app.base import BaseApplication  # pyright: ignore[reportMissingImports]
+
+    class Application(BaseApplication):
+        def load_config(self):
+            # One process: the pose pool, caches and admission gates are per process
+            for key, value in {
+                'bind': f"{host}:{port}",
+                'workers': 1,
+                'worker_class': 'gthread',
+                'threads': threads,
+                'keepalive': KEEPALIVE_SECONDS,
+                # Long analyses keep a thread busy, not the worker's heartbeat
+                'timeout': 120,
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app(mode)
+
+    Application().run()
+
+
+def run_waitress(host, port, threads, mode):
+    from waitress import serve  # pyright: ignore[reportMissingImports]
+    if mode != 'api':
+        print("⚠️  waitress does not serve WebSockets; /live-analysis is unavailable")
+    serve(load_app(mode), host=host, port=port, threads=threads,
+          connection_limit=2 * threads, channel_timeout=KEEPALIVE_SECONDS * 24)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SAP backend with a production WSGI server")
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--mode', choices=APP_MODES, default=os.getenv('APP_MODE', 'all'),
+                        help="Which routes this process serves")
+    parser.add_argument('--server', choices=('gunicorn', 'waitress'), default=None,
+                        help="Default: gunicorn if installed, else waitress")
+    args = parser.parse_args()
+
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401  pyright: ignore[reportMissingImports]
+            server = 'gunicorn'
+        except ImportError:
+            server = 'waitress'
+
+    threads = thread_budget(args.mode)
+    print(f"🚀 Serving SAP backend ({args.mode}) on {args.host}:{args.port} with {server}, {threads} threads")
+    if server == 'gunicorn':
+        run_gunicorn(args.host, args.port, threads, args.mode)
+    else:
+        run_waitress(args.host, args.port, threads, args.mode)
+
+
+if __name__ == "__main__":
+    main()
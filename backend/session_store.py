@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from database import db
+
+# Number of validated tokens kept in memory
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv('SESSION_CACHE_MAX_ENTRIES', '10000'))
+# Seconds a cached validation is trusted before the database is asked again; this bounds
+# how long a logout in another server process can go unnoticed here
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '300'))
+# Seconds an unknown token is remembered as invalid, so a flood of bad tokens stays off the DB
+SESSION_NEGATIVE_TTL = float(os.getenv('SESSION_NEGATIVE_TTL', '5'))
+# Background purge of expired user_sessions rows
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '600'))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', '1000'))
+
+
+class SessionStore:
+    """Validates session tokens through a bounded TTL cache in front of user_sessions.
+
+    Entries expire at the earlier of the token's own expiry and the cache TTL;
+    logout invalidates the entry immediately and leaves a tombstone, so a lookup
+    that read the session row just before it was deleted cannot cache it again.
+    """
+
+    def __init__(self, max_entries=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL,
+                 negative_ttl=SESSION_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # token -> (user_id or None, cache deadline, token expiry as wall-clock timestamp)
+        self._entries = OrderedDict()
+        # token -> tombstone deadline, for tokens logged out in this process
+        self._revoked = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+                       'sweeps': 0, 'swept_rows': 0}
+
+    def _put(self, token, user_id, expires_at, ttl):
+        expires_ts = expires_at.timestamp() if expires_at else None
+        with self._lock:
+            if user_id is not None and self._is_revoked(token):
+                return
+            self._entries[token] = (user_id, time.monotonic() + ttl, expires_ts)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def remember(self, token, user_id, expires_at):
+        """Cache a token created at login so its first use skips the database"""
+        self._put(token, user_id, expires_at, self.ttl)
+
+    def _is_revoked(self, token):
+        deadline = self._revoked.get(token)
+        if deadline is None:
+            return False
+        if time.monotonic() < deadline:
+            return True
+        del self._revoked[token]
+        return False
+
+    def invalidate(self, token):
+        """Forget a token (logout); call after its user_sessions row is deleted"""
+        with self._lock:
+            if self._entries.pop(token, None) is not None:
+                self._stats['invalidations'] += 1
+            # Outlives any validation that was already reading the row
+            self._revoked[token] = time.monotonic() + self.ttl
+            self._revoked.move_to_end(token)
+            while len(self._revoked) > self.max_entries:
+                self._revoked.popitem(last=False)
+
+    def validate(self, token):
+        """Return the user id owning a live session token, or None"""
+        if not token:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            if self._is_revoked(token):
+                self._stats['hits'] += 1
+                return None
+            entry = self._entries.get(token)
+            if entry is not None:
+                user_id, deadline, expires_ts = entry
+                if now < deadline and (expires_ts is None or time.time() < expires_ts):
+                    self._entries.move_to_end(token)
+                    self._stats['hits'] += 1
+                    return user_id
+                del self._entries[token]
+            self._stats['misses'] += 1
+
+        rows = db.execute_query(
+            "SELECT user_id, expires_at FROM user_sessions WHERE session_token = ? AND expires_at > GETDATE()",
+            (token,)
+        )
+        if rows is None:
+            # Database unavailable: do not cache a negative answer
+            return None
+        if rows:
+            self._put(token, rows[0]['user_id'], rows[0]['expires_at'], self.ttl)
+            return rows[0]['user_id']
+        self._put(token, None, None, self.negative_ttl)
+        return None
+
+    def sweep(self, batch_size=SESSION_SWEEP_BATCH):
+        """Delete expired user_sessions rows in small batches; returns the number removed"""
+        removed = 0
+        while True:
+            # Small batches keep each transaction's locks short next to live logins
+            deleted = db.execute_update_rowcount(
+                "DELETE TOP (?) FROM user_sessions WHERE expires_at < GETDATE()", (batch_size,)
+            )
+            if not deleted:
+                break
+            removed += deleted
+            if deleted < batch_size:
+                break
+
+        now = time.time()
+        with self._lock:
+            expired = [token for token, (_, _, expires_ts) in self._entries.items()
+                       if expires_ts is not None and expires_ts <= now]
+            for token in expired:
+                del self._entries[token]
+            self._stats['sweeps'] += 1
+            self._stats['swept_rows'] += removed
+        return removed
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"🧹 Removed {removed} expired sessions")
+            except Exception as e:
+                print(f"⚠️  Session sweep failed: {e}")
+
+    def start_sweeper(self, interval=SESSION_SWEEP_INTERVAL):
+        """Start the background expiry sweeper (idempotent)"""
+        if self._sweeper is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,),
+                                         name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self):
+        """Return cache hit/miss counters and sweep totals"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Global session store instance
+session_store = SessionStore()
@@ -35,6 +35,7 @@ def main():
         print("  - users (user accounts)")
         print("  - user_sessions (login sessions)")
         print("  - exercise_sessions (workout history)")
+        print("  - exercise_daily_rollups (dashboard aggregates)")
     else:
         print("❌ Database setup failed!")
         sys.exit(1)
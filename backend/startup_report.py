@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup cost report for SAP Sports Analysis Platform
+Builds the app in each mode (api, analysis, all) in a fresh interpreter and
+reports import/build time, peak RSS and whether the vision stack was loaded, so
+API-only pods can be checked against their cold-start and memory budget.
+
+Usage: python startup_report.py [--modes api,analysis,all] [--warm-up] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+VISION_MODULES = ('cv2', 'mediapipe', 'numpy')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                 / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def measure_mode(mode, warm):
+    """Build the app in this interpreter and return its startup measurements"""
+    started = time.perf_counter()
+    from app import create_app, warm_up
+    app = create_app(mode)
+    report = {
+        'build_seconds': round(time.perf_counter() - started, 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'routes': sum(1 for _ in app.url_map.iter_rules()),
+        'vision_modules': [name for name in VISION_MODULES if name in sys.modules],
+    }
+    if warm:
+        started = time.perf_counter()
+        warm_up(app)
+        report['warm_up_seconds'] = round(time.perf_counter() - started, 3)
+        report['peak_rss_after_warm_up_mb'] = peak_rss_mb()
+    return report
+
+
+def run_isolated(mode, warm):
+    """Measure one mode in a fresh interpreter so imports from other modes do not count"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode] + (['--warm-up'] if warm else [])
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed = time.perf_counter() - started
+    lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+    if completed.returncode != 0 or not lines:
+        return {'error': (completed.stderr.strip().splitlines() or ['unknown error'])[-1]}
+    report = json.loads(lines[-1])
+    # Includes interpreter start-up, which a real cold start pays too
+    report['process_seconds'] = round(elapsed, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time and memory of each app mode")
+    parser.add_argument('--modes', default='api,analysis,all', help="Comma-separated app modes")
+    parser.add_argument('--warm-up', action='store_true', help="Also time the pose worker warm-up hook")
+    parser.add_argument('--json', help="Write the report to this JSON file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_mode(args.child, args.warm_up)))
+        return
+
+    print("🚦 SAP App Startup Report")
+    print("=" * 60)
+    report = {}
+    for mode in args.modes.split(','):
+        case = report[mode] = run_isolated(mode, args.warm_up)
+        if 'error' in case:
+            print(f"  ❌ {mode:<9} {case['error']}")
+            continue
+        vision = ", ".join(case['vision_modules']) or "none"
+        line = (f"  {mode:<9} build={case['build_seconds']:.2f}s process={case['process_seconds']:.2f}s "
+                f"rss={case['peak_rss_mb']}MB routes={case['routes']} vision={vision}")
+        if 'warm_up_seconds' in case:
+            line += f" warm_up={case['warm_up_seconds']:.2f}s"
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
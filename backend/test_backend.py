@@ -6,6 +6,7 @@ Run this after starting the Flask server to test the health endpoint.
 
 import requests
 import json
+import uuid
 
 def test_health_endpoint():
     """Test the health check endpoint"""
@@ -45,6 +46,64 @@ def test_upload_endpoint():
         print(f"❌ Error testing upload endpoint: {e}")
         return False
 
+def test_analysis_job_endpoint():
+    """Test the async analysis job status endpoint"""
+    try:
+        response = requests.get('http://localhost:5000/analysis-jobs/does-not-exist')
+        if response.status_code == 404:
+            print("✅ Analysis job endpoint is accessible (returns 404 for unknown job - expected)")
+            return True
+        else:
+            print(f"⚠️  Analysis job endpoint returned unexpected status: {response.status_code}")
+            return False
+    except requests.exceptions.ConnectionError:
+        print("❌ Cannot connect to analysis job endpoint")
+        return False
+    except Exception as e:
+        print(f"❌ Error testing analysis job endpoint: {e}")
+        return False
+
+def test_history_pagination_ties():
+    """Page through history where several sessions share one created_at"""
+    try:
+        name = f"pagetest_{uuid.uuid4().hex[:12]}"
+        requests.post('http://localhost:5000/register',
+                      json={'username': name, 'password': 'secret123', 'email': f"{name}@example.com"})
+        login = requests.post('http://localhost:5000/login', json={'username': name, 'password': 'secret123'})
+        if login.status_code != 200:
+            print(f"❌ Could not create a test user: {login.text}")
+            return False
+        user_id = login.json()['user']['id']
+
+        # Saved in one statement without created_at, so all five get the same GETDATE()
+        sessions = [{'user_id': user_id, 'sit_up_count': reps} for reps in range(1, 6)]
+        saved = requests.post('http://localhost:5000/save-exercise-sessions', json={'sessions': sessions})
+        if saved.status_code != 200:
+            print(f"❌ Saving sessions failed with status code: {saved.status_code}")
+            return False
+        expected = sorted(result['session_id'] for result in saved.json()['results'])
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            page = requests.get(f'http://localhost:5000/get-user-history/{user_id}', params=params).json()
+            seen.extend(row['id'] for row in page['history'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        if sorted(seen) != expected:
+            print(f"❌ Paging by 2 returned sessions {sorted(seen)}, expected {expected}")
+            return False
+        print("✅ History pages through sessions that share a timestamp without skipping any")
+        return True
+    except requests.exceptions.ConnectionError:
+        print("❌ Cannot connect to history endpoint")
+        return False
+    except Exception as e:
+        print(f"❌ Error testing history pagination: {e}")
+        return False
+
 if __name__ == "__main__":
     print("🧪 Testing SAP - AI Sports Analysis Backend")
     print("=" * 40)
@@ -55,8 +114,14 @@ if __name__ == "__main__":
     print("\n2. Testing upload endpoint...")
     upload_ok = test_upload_endpoint()
     
+    print("\n3. Testing analysis job endpoint...")
+    jobs_ok = test_analysis_job_endpoint()
+    
+    print("\n4. Testing history pagination...")
+    history_ok = test_history_pagination_ties()
+    
     print("\n" + "=" * 40)
-    if health_ok and upload_ok:
+    if health_ok and upload_ok and jobs_ok and history_ok:
         print("🎉 All tests passed! Backend is ready for mobile app integration.")
         print("\nNext steps:")
         print("1. Update the BACKEND_URL in your mobile app")
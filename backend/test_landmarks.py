@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Parity tests for on-device landmark uploads.
+Checks that a landmark stream survives quantisation and scores exactly like the
+video path: synthetic sit-up tracks, and clips scored by exercises.analyze_video with
+the server's defaults against their landmarks sent as a stream. The benchmark's
+synthetic sit-up clip always runs; more clips can be given on the command line.
+With a running server's URL the clips also go through /upload-video and their
+streams through /upload-landmarks.
+
+Usage: python test_landmarks.py [CLIP ...] [--profile accurate] [--url http://localhost:5000]
+"""
+
+import argparse
+import sys
+import numpy as np
+from analysis import (
+    LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, LandmarkTrack, create_pose, extract_landmarks, get_profile, score_sit_ups
+)
+from benchmark import expected_sit_ups, synthetic_video
+from exercises import EXERCISE_ANALYZERS, analyze_video
+from landmark_stream import analyze_landmark_stream, decode_landmark_stream, encode_landmark_stream
+
+SYNTHETIC_TRACKS = 50
+PARITY_KEYS = ('sit_up_count', 'form_score', 'feedback')
+# Clips are scored for every exercise, so each analyzer's parity is checked
+EXERCISE_TYPES = list(EXERCISE_ANALYZERS)
+# The bundled clip: the benchmark's synthetic sit-ups, generated on first use
+SYNTHETIC_CLIP = (640, 360, 30, 10.0)
+DEFAULT_URL = "http://localhost:5000"
+
+
+def synthetic_sit_up_track(rng, fps=30.0):
+    """A noisy sit-up recording as a LandmarkTrack, with dropouts and a random stride"""
+    frames = int(rng.integers(60, 600))
+    stride = int(rng.integers(1, 4))
+    phase = np.cumsum(rng.uniform(0.05, 0.25, frames))
+    angles = np.radians(np.clip(125 + 55 * np.cos(phase) + rng.normal(0, 3, frames), 0, 180))
+    reach = rng.uniform(0.15, 0.4, frames)
+
+    landmarks = rng.uniform(0.0, 1.0, (frames, 33, 4)).astype(np.float32)
+    landmarks[:, LEFT_HIP, :2] = (0.5, 0.5)
+    landmarks[:, LEFT_KNEE, :2] = (0.7, 0.52)
+    landmarks[:, LEFT_SHOULDER, 0] = 0.5 + reach * np.cos(angles)
+    landmarks[:, LEFT_SHOULDER, 1] = 0.5 - reach * np.sin(angles)
+    landmarks[rng.random(frames) < 0.1] = np.nan
+    frame_indices = (np.arange(frames) * stride).astype(np.int32)
+    return LandmarkTrack(landmarks, frame_indices, frames * stride, fps)
+
+
+def encode_track(track):
+    """What a device would send for this track"""
+    return encode_landmark_stream(track.landmarks, track.frame_indices * 1000.0 / track.fps, track.fps)
+
+
+def test_round_trip():
+    """Encode and decode synthetic tracks; frames, detections and coordinates must survive"""
+    rng = np.random.default_rng(7)
+    worst = 0.0
+    for _ in range(SYNTHETIC_TRACKS):
+        track = synthetic_sit_up_track(rng)
+        decoded = decode_landmark_stream(encode_track(track))
+        assert np.array_equal(decoded.frame_indices, track.frame_indices) and \
+            np.array_equal(decoded.detected, track.detected), "Frame indices or detections changed in the round trip"
+        worst = max(worst, float(np.nanmax(np.abs(decoded.landmarks[:, :, :3] - track.landmarks[:, :, :3]))))
+    assert worst <= 1e-4, f"Quantisation error {worst:.6f} is larger than expected"
+    print(f"✅ {SYNTHETIC_TRACKS} tracks round-tripped, largest coordinate error {worst:.6f}")
+
+
+def test_synthetic_parity():
+    """Score synthetic tracks directly and through a landmark stream; results must match"""
+    rng = np.random.default_rng(11)
+    for index in range(SYNTHETIC_TRACKS):
+        track = synthetic_sit_up_track(rng)
+        expected = score_sit_ups(track)
+        result = analyze_landmark_stream(encode_track(track), ['sit-ups'])
+        actual = {key: result[key] for key in PARITY_KEYS}
+        assert actual == expected, f"Track {index}: video path {expected}, landmark stream {actual}"
+    print(f"✅ {SYNTHETIC_TRACKS} synthetic tracks scored identically")
+
+
+def exercise_results(result):
+    """Per-exercise scores of an analysis result or /upload-landmarks response, without the summary text"""
+    return {name: {key: value for key, value in exercise.items() if key != 'summary'}
+            for name, exercise in result['exercises'].items()}
+
+
+def post_upload(url, endpoint, files, exercise_types):
+    import requests
+    response = requests.post(f"{url}{endpoint}", files=files, data={'exercise_type': ','.join(exercise_types)})
+    assert response.status_code == 200, f"{endpoint} returned {response.status_code}: {response.text}"
+    return response.json()
+
+
+def test_clip_parity(clip=None, profile_name=None, url=None):
+    """analyze_video with server defaults on a clip against its landmarks sent as a stream.
+
+    Without a clip the bundled synthetic one is used, and must also count its reps.
+    """
+    sit_ups = None
+    if clip is None:
+        width, height, fps, duration = SYNTHETIC_CLIP
+        clip, sit_ups = synthetic_video(width, height, fps, duration), expected_sit_ups(duration)
+
+    # What /upload-video runs: one pose pass, default profile, every frame analysed
+    expected = analyze_video(clip, EXERCISE_TYPES, profile_name)
+    assert sit_ups is None or expected['sit_up_count'] == sit_ups, \
+        f"{clip}: analyze_video counted {expected['sit_up_count']} sit-ups, expected {sit_ups}"
+
+    # What a device running the same pose model would send
+    profile = get_profile(profile_name)
+    with create_pose(profile) as pose:
+        track = extract_landmarks(clip, profile, pose)
+    stream = encode_track(track)
+    results = {'landmark stream': analyze_landmark_stream(stream, EXERCISE_TYPES)}
+    if url:
+        # The server's own video path too, so analyze_video here is known to match it
+        with open(clip, 'rb') as f:
+            results['/upload-video'] = post_upload(url, '/upload-video', {'video': f}, EXERCISE_TYPES)
+        results['/upload-landmarks'] = post_upload(url, '/upload-landmarks', {'landmarks': ('track.bin', stream)},
+                                                   EXERCISE_TYPES)
+
+    for source, result in results.items():
+        actual = exercise_results(result)
+        for name, scores in exercise_results(expected).items():
+            assert actual[name] == scores, f"{clip}: {name} is {scores} from the video, {actual[name]} from the {source}"
+    print(f"✅ {clip}: {expected['sit_up_count']} sit-ups, form score {expected['form_score']}, "
+          f"{len(stream) / 1024:.0f} KB of landmarks for {len(track)} frames, "
+          f"same scores via {', '.join(results)}")
+
+
+def test_upload_landmarks_endpoint(url=None):
+    """POST a synthetic stream to /upload-landmarks and compare with local scoring.
+
+    Without a url the local server is tried, and the test is skipped if none is running.
+    """
+    import requests
+    try:
+        requests.get(f"{url or DEFAULT_URL}/health", timeout=10)
+    except requests.exceptions.ConnectionError:
+        if url is None:
+            import pytest
+            pytest.skip(f"No backend running at {DEFAULT_URL}")
+        raise AssertionError(f"Cannot connect to backend at {url}")
+    url = url or DEFAULT_URL
+
+    track = synthetic_sit_up_track(np.random.default_rng(3))
+    expected = score_sit_ups(track)
+    data = post_upload(url, '/upload-landmarks', {'landmarks': ('track.bin', encode_track(track))}, ['sit-ups'])
+    assert data['sit_up_count'] == expected['sit_up_count'] and data['score'] == expected['form_score'], \
+        f"Server scored {data['sit_up_count']} sit-ups ({data['score']}), expected {expected}"
+
+    response = requests.post(f"{url}/upload-landmarks", files={'landmarks': ('bad.bin', b'not landmarks')})
+    assert response.status_code == 400, f"Malformed stream returned unexpected status: {response.status_code}"
+    print("✅ /upload-landmarks matches local scoring and rejects malformed streams")
+
+
+def run_test(test, *args):
+    """Run one test for the command line; True if it passed"""
+    try:
+        test(*args)
+        return True
+    except AssertionError as e:
+        print(f"❌ {e}")
+    except Exception as e:
+        print(f"❌ Error in {test.__name__}: {e}")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Landmark upload parity tests")
+    parser.add_argument('clips', nargs='*', help="More videos to compare against analyze_video")
+    parser.add_argument('--profile', default=None, help="Analysis profile for the clips (default: the server's)")
+    parser.add_argument('--url', help="Also test /upload-landmarks on a running server")
+    args = parser.parse_args()
+
+    print("🧪 Testing on-device landmark uploads")
+    print("=" * 40)
+
+    print("\n1. Testing stream round trip...")
+    results = [run_test(test_round_trip)]
+
+    print("\n2. Testing scoring parity on synthetic tracks...")
+    results.append(run_test(test_synthetic_parity))
+
+    print("\n3. Testing parity with analyze_video on clips...")
+    results.append(run_test(test_clip_parity, None, args.profile, args.url))
+    results.extend(run_test(test_clip_parity, clip, args.profile, args.url) for clip in args.clips)
+
+    if args.url:
+        print("\n4. Testing the /upload-landmarks endpoint...")
+        results.append(run_test(test_upload_landmarks_endpoint, args.url))
+
+    print("\n" + "=" * 40)
+    if all(results):
+        print("🎉 Landmark uploads score the same as video uploads.")
+    else:
+        print("❌ Some tests failed.")
+        sys.exit(1)